@@ -0,0 +1,42 @@
+import numpy as np
+from renderer import Renderer
+from ansi_terminal import AnsiTerminal, CLEAR, write_all
+
+# The terminal (AnsiTerminal) is in ansi_terminal.py, which doesn't need NumPy, so the start screen can be
+# drawn before NumPy is loaded. This module has the renderer.
+MERGE_GAP = 6 # Runs in the same row closer than this are sent as one run, repeating the unchanged cells is shorter than a cursor move.
+
+
+class AnsiRenderer(Renderer):
+    """ Drop-in replacement for Renderer that writes escape sequences instead of calling curses.
+
+    Every changed run becomes a cursor positioning escape followed by the bytes of the run, and the
+    whole frame is sent with one write() system call. Clipping and the bookkeeping of what is on the
+    terminal are the ones of Renderer.
+    """
+
+    def draw(self, frame):
+        """ Draws a frame, only sending the runs of cells that changed.
+        Args:
+            frame (np.ndarray): A 2D uint8 array with one ASCII byte per cell.
+        """
+        frame, rows, starts, ends, full = self._runs(frame)
+        if full:
+            parts = [CLEAR]
+        else:
+            if len(rows) == 0:
+                return
+            # Merge runs separated by a small gap in the same row.
+            joined = (rows[1:] == rows[:-1]) & (starts[1:] - ends[:-1] < MERGE_GAP)
+            first = np.concatenate(([True], ~joined)) # first run of every merged run
+            last = np.concatenate((~joined, [True]))
+            rows, starts, ends = rows[first], starts[first], ends[last]
+            parts = []
+
+        for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+            parts.append(b'\x1b[%d;%dH' % (row + 1, start + 1)) # Move the cursor (1-based)
+            parts.append(frame[row, start:end].tobytes())
+
+        # join() sizes the buffer once, then the frame goes out in one write().
+        write_all(self.stdscr.out_fd, b''.join(parts))
+        np.copyto(self._previous, frame)
@@ -0,0 +1,90 @@
+import os
+import sys
+import curses
+import signal
+import select
+import collections
+
+# Escape sequences (VT100 / xterm)
+ENTER_SCREEN = b'\x1b[?1049h\x1b[?25l\x1b[?7l\x1b[2J' # alternate screen, hide cursor, no line wrap, clear
+LEAVE_SCREEN = b'\x1b[0m\x1b[?7h\x1b[?25h\x1b[?1049l' # reset attributes, line wrap, show cursor, normal screen
+CLEAR = b'\x1b[2J'
+
+
+def write_all(fd, data):
+    """ Writes bytes to a file descriptor, normally with a single write() system call. """
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class AnsiTerminal:
+    """ The terminal without curses: cbreak mode via termios and escape sequences for the screen.
+
+    It offers the few methods of a curses window the game uses (getch, getmaxyx, nodelay, keypad, and
+    clear, addstr and refresh for the start screen), so main() runs unchanged with it. Use it as a
+    context manager, the terminal is restored on exit. Only available where termios exists (Linux, macOS).
+    """
+
+    def __init__(self, in_fd=None, out_fd=None):
+        self.in_fd = sys.stdin.fileno() if in_fd is None else in_fd
+        self.out_fd = sys.stdout.fileno() if out_fd is None else out_fd
+        self._keys = collections.deque() # Bytes read from the terminal that getch() has not returned yet
+        self._pending = [] # Output of clear() and addstr() that refresh() has not sent yet
+        self._resized = False # Set by the SIGWINCH handler
+        self._saved_mode = None
+        self._saved_handler = None
+
+    def __enter__(self):
+        import termios
+        import tty
+        self._saved_mode = termios.tcgetattr(self.in_fd)
+        tty.setcbreak(self.in_fd) # Keys arrive one by one without echo, Ctrl-C still works
+        if hasattr(signal, 'SIGWINCH'):
+            self._saved_handler = signal.signal(signal.SIGWINCH, self._on_resize)
+        write_all(self.out_fd, ENTER_SCREEN)
+        return self
+
+    def __exit__(self, *exc_info):
+        import termios
+        write_all(self.out_fd, LEAVE_SCREEN)
+        if self._saved_handler is not None:
+            signal.signal(signal.SIGWINCH, self._saved_handler)
+        termios.tcsetattr(self.in_fd, termios.TCSADRAIN, self._saved_mode)
+
+    def _on_resize(self, signum, frame):
+        self._resized = True
+
+    def nodelay(self, flag):
+        pass # getch() never waits
+
+    def keypad(self, flag):
+        pass # Escape sequences are not decoded, ESC arrives as 27
+
+    def clear(self):
+        """ Clears the screen with the next refresh(). """
+        self._pending.append(CLEAR)
+
+    def addstr(self, row, col, text):
+        """ Writes bytes at a position with the next refresh(), like the curses method. """
+        self._pending.append(b'\x1b[%d;%dH' % (row + 1, col + 1))
+        self._pending.append(text)
+
+    def refresh(self):
+        """ Sends everything since the last refresh() with one write(). """
+        write_all(self.out_fd, b''.join(self._pending))
+        self._pending.clear()
+
+    def getmaxyx(self):
+        """ Returns the size of the terminal as (lines, columns), like the curses method. """
+        size = os.get_terminal_size(self.out_fd)
+        return size.lines, size.columns
+
+    def getch(self):
+        """ Returns the next key without waiting: a byte, curses.KEY_RESIZE after SIGWINCH, or -1 if there is none. """
+        if self._resized:
+            self._resized = False
+            return curses.KEY_RESIZE
+        if not self._keys and select.select([self.in_fd], [], [], 0)[0]:
+            self._keys.extend(os.read(self.in_fd, 64))
+        return self._keys.popleft() if self._keys else -1
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import curses
+import asyncio
+import argparse
+from helper_functions import get_screen_templates
+from renderer import Renderer
+from clock import FixedStepClock
+from engine import GameState, step, compose_frame, new_frame, FLAP, NOOP, EVENT_CRASH
+from menus import terminal_size, KEY_ESC, KEY_ENTER, KEY_SPACE
+
+POLL_INTERVAL = 0.005 # Seconds between two reads of the keyboard if stdin can't be watched by the event loop
+
+
+class AsyncRunner:
+    """ Runs one game of Pengu Fly in an asyncio event loop, without threads.
+
+    Three tasks share the loop: the reader moves the keys into a queue as soon as stdin becomes
+    readable, the ticker advances the game on the fixed tick schedule of the difficulty, and the
+    renderer draws a frame whenever the ticker produced a new one (several ticks in a row are drawn
+    once). Other coroutines can run in the same loop, e.g. a socket server that sends keys with
+    press() and watches the game with on_frame.
+
+    Args:
+        stdscr: The curses window to draw to and read the keys from.
+        difficulty (int): Difficulty of the game if no state is given.
+        seed (int, optional): Seed of the game if no state is given, random if None.
+        state (GameState, optional): A game to play, e.g. one that was reset in place. A new game with
+            the size of the terminal if None.
+        on_frame (callable, optional): Called with the frame (uint8 array) after every drawn frame.
+    """
+
+    def __init__(self, stdscr, difficulty=1, seed=None, state=None, on_frame=None):
+        if state is None:
+            state = GameState(difficulty, *terminal_size(stdscr), seed)
+        self.stdscr = stdscr
+        self.state = state
+        self.on_frame = on_frame
+        self.renderer = Renderer(stdscr)
+        self.frame = new_frame(state)
+        self.screens = get_screen_templates(state.height, state.width)
+        self.keys = asyncio.Queue() # Keys that the ticker has not handled yet
+        self.paused = False
+        self._frame_ready = asyncio.Event() # Set by the ticker when the game changed since the last drawn frame
+
+    def press(self, key):
+        """ Sends a key to the game as if it was pressed on the terminal. """
+        self.keys.put_nowait(key)
+
+    async def run(self):
+        """ Plays the game until the penguin crashes or the player quits in the pause screen.
+        Returns:
+            GameState: The game at the end.
+        """
+        self.stdscr.nodelay(True)
+        self._frame_ready.set() # Draw the first frame right away.
+        tasks = [asyncio.create_task(self._reader()), asyncio.create_task(self._render())]
+        try:
+            await self._ticker()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self.state.crashed:
+            self.renderer.draw(self.screens.crash_screen(self.state.score))
+        return self.state
+
+    async def _reader(self):
+        """ Task that reads the keys from the terminal as they arrive. """
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fd = None
+        try:
+            if os.isatty(sys.stdin.fileno()):
+                fd = sys.stdin.fileno()
+                loop.add_reader(fd, readable.set)
+        except (OSError, ValueError, NotImplementedError):
+            fd = None # e.g. the Windows event loop or no real stdin: poll instead
+        try:
+            while True:
+                if fd is None:
+                    await asyncio.sleep(POLL_INTERVAL)
+                else:
+                    await readable.wait()
+                    readable.clear()
+                # curses may have buffered several keys (or an escape sequence), read all of them.
+                key = self.stdscr.getch()
+                while key != -1:
+                    self.keys.put_nowait(key)
+                    key = self.stdscr.getch()
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+
+    async def _ticker(self):
+        """ Task that advances the game by all ticks that are due, then sleeps until the next one.
+        Returns when the penguin crashed or the player quit.
+        """
+        state = self.state
+        clock = FixedStepClock(state.fps)
+        while True:
+            # Handle the keys that arrived since the last tick.
+            flap = False
+            while not self.keys.empty():
+                key = self.keys.get_nowait()
+                if key == KEY_SPACE:
+                    flap = True
+                elif key == curses.KEY_RESIZE:
+                    self.renderer.resize()
+                    self.screens = get_screen_templates(*terminal_size(self.stdscr))
+                    self._frame_ready.set()
+                elif key == KEY_ESC:
+                    if not await self._pause():
+                        return
+                    clock.reset() # Don't catch up on the time spent in the pause screen.
+                    self._frame_ready.set()
+
+            for _ in range(clock.ticks_due()):
+                state, events = step(state, FLAP if flap else NOOP)
+                flap = False # A key press only makes the penguin jump once.
+                self._frame_ready.set()
+                if events & EVENT_CRASH:
+                    return
+
+            # Let the other tasks run until the next tick is due.
+            await asyncio.sleep(max(clock.next_deadline() - time.perf_counter(), 0))
+
+    async def _pause(self):
+        """ Shows the pause screen and waits for the player.
+        Returns:
+            bool: True to resume the game, False to quit.
+        """
+        self.paused = True
+        self.renderer.draw(self.screens.pause_screen(self.state.score))
+        try:
+            while True:
+                key = await self.keys.get()
+                if key == KEY_ENTER:
+                    return True
+                elif key == KEY_ESC:
+                    return False
+                elif key == curses.KEY_RESIZE:
+                    self.renderer.resize()
+                    self.screens = get_screen_templates(*terminal_size(self.stdscr))
+                    self.renderer.draw(self.screens.pause_screen(self.state.score))
+        finally:
+            self.paused = False
+
+    async def _render(self):
+        """ Task that draws the game whenever the ticker changed it. """
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            if self.paused:
+                continue
+            compose_frame(self.state, self.frame)
+            self.renderer.draw(self.frame)
+            if self.on_frame is not None:
+                self.on_frame(self.frame)
+
+
+def main(stdscr, difficulty=1, seed=None):
+    """ Plays one game with the asyncio runner and waits for a key on the crash screen. """
+    curses.curs_set(0)
+    state = asyncio.run(AsyncRunner(stdscr, difficulty, seed).run())
+    if state.crashed:
+        stdscr.nodelay(False)
+        stdscr.getch()
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pengu Fly on an asyncio event loop")
+    parser.add_argument('-d', '--difficulty', type=int, choices=(1, 2, 3), default=1, help="1 - Easy, 2 - Medium, 3 - Hard")
+    parser.add_argument('--seed', type=int, help="seed for the walls")
+    args = parser.parse_args()
+    state = curses.wrapper(main, args.difficulty, args.seed)
+    print(f"Score: {state.score}")
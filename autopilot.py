@@ -0,0 +1,471 @@
+import math
+from engine import FLAP, NOOP
+
+SWEEP_BUDGET = 1000 # Interval operations of the sweep per frame, a sweep that needs more continues in the next frames
+WALLS_AHEAD = 6 # The sweep plans through at most this many walls in front of the penguin
+TICK_COST = 5 # Interval operations that the bookkeeping of a tick in the sweep costs, and the free heights of a tick
+EPSILON = 1e-9 # Margin for the rounding errors of the heights, in rows
+
+# Velocity families of the trajectory tables: the penguin's velocity is always reached by falling for k
+# ticks, either from a flap (velocity -imp) or from rest (velocity 0, at the start and after hitting the top
+# or the bottom of the screen).
+FLAPPED = 0
+RESTING = 1
+
+
+class TrajectoryTable:
+    """ Velocities and height changes of the penguin for one tick rate, for every number of ticks
+    after a flap and after being at rest. The values are calculated with the same floating point
+    operations as step(), so following the table reproduces the game exactly.
+    Args:
+        fps (int): Tick rate.
+        g (float): Gravity.
+        imp (float): Velocity of a flap.
+        height (int): Height of the screen, the tables are long enough to fall through all of it.
+    """
+
+    def __init__(self, fps, g, imp, height):
+        dt = 1/fps
+        gdt = g * (1/fps)
+        self.velocity = ([], []) # velocity[family][k]: velocity k ticks after the flap / the rest
+        self.dy = ([], []) # dy[family][k]: change of the height in the tick that ends with velocity[family][k]
+        self.fallen = ([], []) # fallen[family][k]: sum of dy[family][0..k], the fall from k to j ticks is fallen[j] - fallen[k]
+        self.index = {} # velocity -> (family, k)
+        self.climb = 0 # Height gained by a flap until the penguin starts falling again
+        for family, velocity in ((FLAPPED, -imp), (RESTING, 0)):
+            fallen = 0
+            while fallen < 2 * height:
+                self.velocity[family].append(velocity)
+                self.dy[family].append(velocity * dt)
+                self.index.setdefault(velocity, (family, len(self.velocity[family]) - 1))
+                fallen += velocity * dt
+                self.fallen[family].append(fallen)
+                if family == FLAPPED:
+                    self.climb = max(self.climb, -fallen)
+                velocity = velocity + gdt
+
+
+# One table per tick rate and screen height, shared by all autopilots
+_tables = {}
+
+
+def trajectory_table(state):
+    """ Returns the trajectory table for the physics of a game. """
+    key = (state.fps, state.g, state.imp, state.height)
+    if key not in _tables:
+        _tables[key] = TrajectoryTable(state.fps, state.g, state.imp, state.height)
+    return _tables[key]
+
+
+def column_rows(sprite, width):
+    """ Returns the visible rows of every column of a sprite as bit masks (bit r set: row r is visible). """
+    masks = [0] * width
+    for row, runs in enumerate(sprite.runs):
+        for start, end in runs:
+            for column in range(start, end):
+                masks[column] |= 1 << row
+    return masks
+
+
+# Sets of heights are sorted lists of disjoint closed intervals (low, high).
+
+def clip(heights, low, high):
+    """ Returns the heights between low and high. """
+    clipped = []
+    for start, end in heights:
+        start, end = max(start, low), min(end, high)
+        if start <= end:
+            clipped.append((start, end))
+    return clipped
+
+
+def intersect(heights, other, shift):
+    """ Returns the heights that are in other after moving other by shift. """
+    if len(heights) == 1 and len(other) == 1:
+        start, end = max(heights[0][0], other[0][0] + shift), min(heights[0][1], other[0][1] + shift)
+        return [(start, end)] if start <= end else []
+    common = []
+    i = j = 0
+    while i < len(heights) and j < len(other):
+        start, end = max(heights[i][0], other[j][0] + shift), min(heights[i][1], other[j][1] + shift)
+        if start <= end:
+            common.append((start, end))
+        if heights[i][1] < other[j][1] + shift:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def subtract(heights, other):
+    """ Returns the heights that are not in other. """
+    rest = []
+    j = 0
+    for start, end in heights:
+        while j < len(other) and other[j][1] < start:
+            j += 1
+        i = j
+        while i < len(other) and other[i][0] <= end:
+            if other[i][0] > start:
+                rest.append((start, other[i][0]))
+            start = max(start, other[i][1])
+            i += 1
+        if start < end:
+            rest.append((start, end))
+    return rest
+
+
+def merge(pieces):
+    """ Returns the union of intervals in any order as a set of heights. """
+    pieces.sort()
+    heights = []
+    for start, end in pieces:
+        if heights and start <= heights[-1][1]:
+            if end > heights[-1][1]:
+                heights[-1] = (heights[-1][0], end)
+        else:
+            heights.append((start, end))
+    return heights
+
+
+def contains(heights, y):
+    """ Checks if a height is in a set of heights. """
+    for start, end in heights:
+        if start <= y <= end:
+            return True
+    return False
+
+
+class _Sweep:
+    """ The heights from which the penguin gets through the walls until a horizon, found backwards from it.
+
+    flaps[t] are the heights before tick t from which a flap in tick t leads to the horizon. After the flap
+    the penguin falls along the trajectory table until it flaps again, hits the top or the bottom of the
+    screen or reaches the horizon, so flaps[t] follows from the later ticks. top[t] and bottom[t] tell if
+    the penguin gets there from rest at the top or the bottom of the screen.
+    """
+
+    def __init__(self, horizon, window):
+        self.horizon = horizon
+        self.window = window # (highest y, lowest y, ticks) the end has to reach, None for any height at the horizon
+        self.flaps = {horizon: []}
+        self.top = {}
+        self.bottom = {}
+        self.next = horizon - 1 # Next tick to sweep
+
+
+class Autopilot:
+    """ Flies the penguin: finds the flaps that get it through the next walls.
+
+    A flap sets the velocity of the penguin, so its height in every later tick until the next flap
+    follows from the trajectory table. Which heights are free in a tick is known in advance from the
+    walls (they move one column per tick) and the wing frame of the penguin. A sweep goes backwards from
+    the tick in which the penguin has passed the next WALLS_AHEAD walls (the horizon) and finds for every
+    tick the heights from which a flap leads to the horizon: the falls after the flap that stay in the
+    free heights until they reach the heights of a later flap, the horizon, or the top or the bottom of
+    the screen, from where the same is known. The heights are sets of intervals, so the sweep is exact.
+
+    Every frame the action that steers towards the middle of the next opening is taken if it still
+    leads to the horizon, the other one otherwise. The sweep runs at most sweep_budget interval
+    operations per frame and continues in the next frame where it stopped, so every frame takes about
+    the same time. When the horizon moves on to the next wall, the penguin follows the previous sweep
+    until the new one is done.
+
+    The wall after the horizon may not be on the screen yet, but its opening is at most state.offset
+    rows above or below the one before. The sweep first looks for flaps that end where both the highest
+    and the lowest of these openings can still be reached, and only if there are none for any that get
+    to the horizon. Some layouts of the walls can't be passed at all: then the sweeps end at the walls
+    before, to fly as far as possible.
+
+    Args:
+        sweep_budget (int): Maximum interval operations per frame.
+    """
+
+    def __init__(self, sweep_budget=SWEEP_BUDGET):
+        self.sweep_budget = sweep_budget
+        self.sweeps = 0 # Number of sweeps started
+        self._game = None # (game, seed) of the game the sweeps are for
+        self._horizon_wall = None # Number of the last wall the sweeps plan through
+        self._tick = 0 # Tick of the last action
+        self._sweep = None # The finished sweep the penguin follows
+        self._pending = None # The sweep in progress
+        self._steps = None # Generator that runs the pending sweep
+        self._horizon = 0 # Tick in which the penguin has passed the last wall the sweeps plan through
+        self._robust_window = None # (highest y, lowest y, ticks) from which every opening of the wall after it is reached
+        self._ends = [] # Tick in which the penguin has passed each wall until the horizon
+        self._origin = 0 # Tick of _targets[0]
+        self._targets = [] # Height of the middle of the next opening in every tick until the horizon
+        self._free = {} # tick -> free heights of the penguin after the step, for the game in _game
+        self._columns = {} # sprite -> visible rows per column
+        self._opening_masks = {} # (visible rows, opening_top, opening_bottom) -> allowed rows
+
+    def action(self, state):
+        """ Returns the action for the next step of a game (FLAP or NOOP). """
+        tick = state.timesteps
+        game = (id(state), state.seed)
+        if game != self._game or tick < self._tick:
+            self._new_game(game) # Another game, or the game was reset
+        self._tick = tick
+        table = trajectory_table(state)
+
+        # A sweep in progress is finished first, it may be the one that still leads through the walls.
+        horizon_wall = self._horizon_wall_number(state)
+        if self._pending is None and horizon_wall != self._horizon_wall:
+            self._horizon_wall = horizon_wall
+            self._plan_walls(state)
+            self._start_sweep(state, table, self._horizon, self._robust_window)
+        if self._pending is not None:
+            self._work(state, table)
+
+        family, k = table.index.get(state.y_p, (RESTING, 0))
+        actions = self._order(table, tick, state.y, family, k)
+        if self._sweep is not None:
+            for action in actions:
+                if self._leads_to_horizon(state, table, self._sweep, action):
+                    return action
+        return actions[0]
+
+    def _new_game(self, game):
+        """ Forgets everything about the previous game. """
+        self._game = game
+        self._horizon_wall = None
+        self._sweep = self._pending = self._steps = None
+        self._free.clear()
+
+    def _opening_mask(self, rows, top, bottom, state):
+        """ Returns the heights (y_start) at which a column with the visible rows does not hit the edge
+        of a wall with the opening [top, bottom), as a bit mask.
+        """
+        key = (rows, top, bottom)
+        mask = self._opening_masks.get(key)
+        if mask is None:
+            # Bit r of blocked: screen row r is solid (inside the play field, outside the opening).
+            blocked = ((1 << (state.height - 1)) - 2) & ~(((1 << bottom) - 1) & ~((1 << top) - 1))
+            mask = 0
+            for y in range(state.height - 6):
+                if not (rows << y) & blocked:
+                    mask |= 1 << y
+            self._opening_masks[key] = mask
+        return mask
+
+    def _tick_mask(self, state, tick):
+        """ Returns the heights (y_start) that are free of walls after a tick (tick 0 is the next step). """
+        penguin = state.penguin
+        # The walls move before the collision check, and fly() switches the wings every flap_ticks calls.
+        moved = tick + 1
+        status = penguin.fly_status ^ (((penguin.timesteps + moved) // penguin.flap_ticks) & 1)
+        sprite = penguin.atlas[status]
+        columns = self._columns.get(sprite)
+        if columns is None:
+            columns = self._columns[sprite] = column_rows(sprite, penguin.width)
+        mask = (1 << (state.height - 6)) - 1
+        for wall in state.walls:
+            if wall.x - moved - state.x_start >= len(columns):
+                break # The walls are sorted by x, the others are still in front of the penguin.
+            for edge in wall.edges():
+                column = edge - moved - state.x_start
+                if 0 <= column < len(columns) and columns[column]:
+                    mask &= self._opening_mask(columns[column], wall.opening_top, wall.opening_bottom, state)
+        return mask
+
+    def _free_heights(self, state, tick):
+        """ Returns the heights (y) that are free of walls after the step of an absolute tick, cached for
+        the game. The heights round to the free rows, without the edges of the rows (rounding errors).
+        """
+        heights = self._free.get(tick)
+        if heights is None:
+            mask = self._tick_mask(state, tick - state.timesteps)
+            heights = self._free[tick] = []
+            while mask:
+                low = (mask & -mask).bit_length() - 1
+                high = (~mask & (mask + (1 << low))).bit_length() - 2 # The run of free rows from low ends at high.
+                heights.append((low - 0.5 + EPSILON, high + 0.5 - EPSILON))
+                mask &= -1 << (high + 1)
+        return heights
+
+    def _horizon_wall_number(self, state):
+        """ Returns the number of the last wall the sweep plans through, None if no wall is in front of the penguin. """
+        ahead = 0
+        for number, wall in enumerate(state.walls):
+            if wall.x + state.wallwidth - 1 >= state.x_start:
+                ahead += 1
+                if ahead == WALLS_AHEAD:
+                    return state.first_wall + number
+        return state.first_wall + len(state.walls) - 1 if ahead else None
+
+    def _plan_walls(self, state):
+        """ Prepares the sweeps for the walls in front of the penguin: horizon, targets and the robust window. """
+        start = state.timesteps
+        for passed in [tick for tick in self._free if tick < start]:
+            del self._free[passed]
+        # A wall is the next one until its right edge is left of the penguin.
+        walls = [wall for wall in state.walls if wall.x + state.wallwidth - 1 >= state.x_start][:WALLS_AHEAD]
+        self._ends = [start + wall.x + state.wallwidth - state.x_start for wall in walls]
+        self._horizon = self._ends[-1] if walls else start + 1
+        self._origin = start
+        self._targets = targets = []
+        for wall, end in zip(walls, self._ends):
+            targets.extend([(wall.opening_top + wall.opening_bottom) / 2 - 3] * (end - start - len(targets)))
+        targets.extend([state.height / 2 - 3] * (self._horizon - start - len(targets)))
+
+        # Heights from which the penguin reaches the highest and the lowest possible opening of the next wall.
+        self._robust_window = None
+        if walls:
+            half = math.ceil(state.opening_height/2)
+            center = walls[-1].opening_position
+            width = state.x_end - state.x_start
+            highest = max(center - state.offset, half + 1) + half + 1 - state.penguin.height # Lowest y through the highest opening
+            lowest = min(center + state.offset, state.height - 2 - half - 1) - half + 1 # Highest y through the lowest opening
+            self._robust_window = (highest, lowest, state.wall_distance - state.wallwidth - width + 1)
+
+    def _start_sweep(self, state, table, horizon, window):
+        """ Starts a new sweep back from a horizon, the penguin follows the previous one until it is done. """
+        self.sweeps += 1
+        lowest = state.height - 7
+        sweep = _Sweep(horizon, window)
+        low, high = self._end_heights(table, RESTING, 0, lowest, window)
+        sweep.top[horizon] = low <= 0 <= high
+        sweep.bottom[horizon] = low <= lowest <= high
+        self._pending = sweep
+        self._steps = self._run(state, table, sweep)
+
+    def _work(self, state, table):
+        """ Continues the pending sweep for sweep_budget interval operations. When it is done, the penguin
+        follows it if it leads to the horizon from the current state. Otherwise the next sweep drops the
+        robust window, or ends at the wall before.
+        """
+        budget = self.sweep_budget
+        while budget > 0 and self._pending is not None:
+            cost = next(self._steps, None)
+            if cost is not None:
+                budget -= cost
+                continue
+            sweep = self._pending
+            self._pending = self._steps = None
+            if self._leads_to_horizon(state, table, sweep, FLAP) or self._leads_to_horizon(state, table, sweep, NOOP):
+                self._sweep = sweep
+            elif sweep.window is not None:
+                self._start_sweep(state, table, sweep.horizon, None)
+            else:
+                # Crashes anyway, fly as far as possible.
+                earlier = [end for end in self._ends if state.timesteps < end < sweep.horizon]
+                if earlier:
+                    self._start_sweep(state, table, earlier[-1], None)
+                else:
+                    self._sweep = None
+
+    def _end_heights(self, table, family, k, lowest, window):
+        """ Returns the (low, high) heights at the horizon from which the penguin, k ticks after a flap or the
+        rest, can reach the highest and the lowest y of the window.
+        """
+        if window is None:
+            return 0, lowest
+        highest, low, ticks = window
+        fallen = table.fallen[family]
+        # Half a row of tolerance: the heights are rounded to rows.
+        deepest = fallen[min(k + ticks, len(fallen) - 1)] - fallen[k]
+        return max(low - 0.5 - deepest, 0), min(highest + 0.5 - ticks * table.dy[FLAPPED][0], lowest)
+
+    def _run(self, state, table, sweep):
+        """ Generator that sweeps from the horizon back to the current tick and yields the interval
+        operations of every step.
+        """
+        horizon, window = sweep.horizon, sweep.window
+        flaps, top, bottom = sweep.flaps, sweep.top, sweep.bottom
+        lowest = state.height - 7
+        flapped, resting = table.fallen
+        while sweep.next >= state.timesteps:
+            tick = sweep.next
+            # Follow the fall after a flap in this tick for all heights at once: the penguin is at y + fallen
+            # after the step of tick + j. A height leaves the fall when it hits a wall or reaches the heights
+            # of a later flap, the top or the bottom of the screen, or the horizon.
+            pieces = []
+            heights = [(0.0, float(lowest))]
+            for j, fallen in enumerate(flapped):
+                step = tick + j
+                free = self._free.get(step)
+                if free is None:
+                    free = self._free_heights(state, step)
+                    yield TICK_COST
+                if heights[0][0] + fallen < 0:
+                    if top.get(step + 1) and free and free[0][0] <= 0:
+                        pieces += clip(heights, -math.inf, -fallen)
+                    heights = clip(heights, -fallen, math.inf)
+                if heights and heights[-1][1] + fallen > lowest:
+                    if bottom.get(step + 1) and free and free[-1][1] >= lowest:
+                        pieces += clip(heights, lowest - fallen, math.inf)
+                    heights = clip(heights, -math.inf, lowest - fallen)
+                heights = intersect(heights, free, -fallen)
+                if not heights:
+                    break
+                if step + 1 == horizon:
+                    low, high = self._end_heights(table, FLAPPED, j, lowest, window)
+                    pieces += clip(heights, low - fallen, high - fallen)
+                    break
+                later = flaps[step + 1]
+                if later:
+                    reached = intersect(heights, later, -fallen)
+                    if reached:
+                        pieces += reached
+                        heights = subtract(heights, reached)
+                        if not heights:
+                            break
+                yield 1 + len(heights) + len(later)
+            flaps[tick] = merge(pieces)
+
+            # From rest at the top: flap now, or fall until a later flap.
+            reaches = contains(flaps[tick], 0)
+            m = 0
+            while not reaches and m + 1 < len(resting):
+                m += 1
+                step = tick + m - 1
+                y = resting[m]
+                if y > lowest:
+                    reaches = contains(self._free_heights(state, step), lowest) and bottom[step + 1]
+                    break
+                if not contains(self._free_heights(state, step), y):
+                    break
+                if step + 1 == horizon:
+                    low, high = self._end_heights(table, RESTING, m, lowest, window)
+                    reaches = low <= y <= high
+                    break
+                reaches = contains(flaps[step + 1], y)
+            top[tick] = reaches
+            # From rest at the bottom: flap now, or stay there.
+            bottom[tick] = contains(flaps[tick], lowest) or (contains(self._free_heights(state, tick), lowest) and bottom[tick + 1])
+            sweep.next -= 1
+            yield m + TICK_COST
+
+    def _leads_to_horizon(self, state, table, sweep, action):
+        """ Checks if an action in the current tick leads to the horizon of a finished sweep. """
+        tick, y = state.timesteps, state.y
+        if tick >= sweep.horizon:
+            return True
+        if action == FLAP:
+            return contains(sweep.flaps.get(tick, ()), y)
+        lowest = state.height - 7
+        family, k = table.index.get(state.y_p, (RESTING, 0))
+        fallen = table.fallen[family]
+        for m in range(1, len(fallen) - k):
+            step = tick + m - 1
+            height = y + fallen[k + m] - fallen[k]
+            if height < 0:
+                return contains(self._free_heights(state, step), 0) and sweep.top[step + 1]
+            if height > lowest:
+                return contains(self._free_heights(state, step), lowest) and sweep.bottom[step + 1]
+            if not contains(self._free_heights(state, step), height):
+                return False
+            if step + 1 == sweep.horizon:
+                low, high = self._end_heights(table, family, k + m, lowest, sweep.window)
+                return low <= height <= high
+            if contains(sweep.flaps[step + 1], height):
+                return True
+        return False
+
+    def _order(self, table, tick, y, family, k):
+        """ Returns the actions of a tick, the preferred one first. """
+        if not self._origin <= tick < self._origin + len(self._targets):
+            return NOOP, FLAP
+        # Flap if the penguin is falling and a flap would center its climb on the middle of the opening.
+        falling = table.velocity[family][k] >= 0 and y > self._targets[tick - self._origin] + table.climb / 2
+        return (FLAP, NOOP) if falling else (NOOP, FLAP)
@@ -0,0 +1,184 @@
+import math
+import numpy as np
+from penguin import Penguin
+from engine import DIFFICULTIES, WALLWIDTH, FLAP, flap_ticks
+
+
+class BatchSimulator:
+    """ Simulates many games of Pengu Fly at once, stored as NumPy arrays with one entry per game.
+
+    The rules are the same as in engine.step(): walls are spawned every wall_distance frames with the
+    placement rule of Wall, the penguin collides when a '|' of a wall is behind a visible cell of
+    the penguin's sprite and a point is scored when the inside of a wall reaches the column in front
+    of the penguin. Instead of drawing the walls into a play field, the column of every wall slice
+    is calculated from the frame it was spawned in, so a step costs the same no matter how big the
+    screen is.
+    """
+
+    def __init__(self, n, difficulty=1, height=30, width=150, seed=None):
+        self.n = n
+        self.height = height
+        self.width = width
+        self.rng = np.random.default_rng(seed)
+
+        # Settings of the difficulty and the constants of the engine
+        settings = DIFFICULTIES[difficulty]
+        self.difficulty = difficulty
+        self.fps = settings['fps']
+        self.flap_ticks = flap_ticks(self.fps)
+        self.opening_height = settings['opening_height']
+        self.wall_distance = settings['wall_distance']
+        self.wallwidth = WALLWIDTH
+        self.offset = settings['offset']
+        self.g = 5*9.81
+        self.imp = 20
+        self.x_start = 14
+        self.x_end = 26
+
+        # Frame in which a wall slice written at the right edge reaches the penguin's box / the score column
+        self._box_delay = (width-2) - self.x_start
+        self._score_delay = (width-2) - self.x_end + self.wallwidth//2
+
+        # Rows of the opening relative to the wall center: screen rows [center-half+1, center+half+1) are free
+        self._half_opening = math.ceil(self.opening_height/2)
+        self._rows = np.arange(6)
+
+        # Collision footprint of both animation frames: the visible cells of the sprite
+        self._footprint = np.stack([sprite.mask for sprite in Penguin().atlas])
+
+        # Openings of the walls that can still reach the penguin, indexed by wall number modulo queue_length
+        self.queue_length = (width + self.wall_distance - 1) // self.wall_distance + 2
+
+        # State of every game
+        self.timesteps = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n)
+        self.y_p = np.zeros(n)
+        self.y_start = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.alive = np.ones(n, dtype=bool)
+        self.crash_frame = np.full(n, -1, dtype=np.int64)
+        self.last_center = np.zeros(n, dtype=np.int64)
+        self.openings = np.zeros((n, self.queue_length), dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        """ Starts new games.
+        Args:
+            mask (np.ndarray, optional): Boolean array selecting the games to restart. All games if None.
+        """
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.timesteps[mask] = 0
+        self.y[mask] = 7
+        self.y_p[mask] = 0
+        self.y_start[mask] = 7
+        self.score[mask] = 0
+        self.alive[mask] = True
+        self.crash_frame[mask] = -1
+        self.last_center[mask] = self.height//2
+
+    def _spawn_walls(self, games):
+        """ Chooses the openings of the walls spawned this frame, with the placement rule of Wall. """
+        height = self.height - 2
+        last_center = self.last_center[games]
+        upper_bound = np.minimum(last_center + self.offset, height - self._half_opening - 1)
+        lower_bound = np.maximum(last_center - self.offset, self._half_opening + 1)
+        centers = self.rng.integers(lower_bound, upper_bound + 1)
+        wall_number = self.timesteps[games] // self.wall_distance
+        self.openings[games, wall_number % self.queue_length] = centers
+        self.last_center[games] = centers
+
+    def _edge_collision(self, games, t, edge):
+        """ Tests the penguins against one edge ('|' slice) of the wall in front of them.
+        Args:
+            games (np.ndarray): Indices of the games to test.
+            t (np.ndarray): Current frame of each game.
+            edge (int): Index of the edge slice inside the wall (0 or wallwidth-1).
+        Returns:
+            np.ndarray: Boolean array, True where the penguin hits the edge.
+        """
+        # Frame in which the slice now at the first column of the box was written, and the first frame
+        # in the next 12 that wrote this edge. That edge is now in box column j.
+        written = t - self._box_delay
+        edge_written = written + (edge - written) % self.wall_distance
+        j = edge_written - written
+        present = (j < 12) & (edge_written >= 0)
+        if not present.any():
+            return present
+
+        games, j, present_t = games[present], j[present], t[present]
+        center = self.openings[games, (edge_written[present] // self.wall_distance) % self.queue_length]
+
+        # Rows of the box that contain a '|' of the edge slice
+        rows = self.y_start[games, None] + self._rows
+        in_opening = (rows >= (center - self._half_opening + 1)[:, None]) & (rows < (center + self._half_opening + 1)[:, None])
+        wall_rows = (rows >= 1) & (rows <= self.height-2) & ~in_opening
+
+        # Animation frame of the penguin after this frame's call of Penguin.fly()
+        art = ((present_t + 1) // self.flap_ticks) % 2
+        hit = np.any(wall_rows & self._footprint[art, :, j], axis=1)
+
+        collided = np.zeros(len(present), dtype=bool)
+        collided[present] = hit
+        return collided
+
+    def step(self, actions):
+        """ Advances all running games by one frame.
+        Args:
+            actions (np.ndarray): One action per game (FLAP or NOOP), or a boolean array that is True to flap.
+        Returns:
+            tuple: Two boolean arrays (scored, crashed), True for the games that scored / crashed this frame.
+        """
+        games = np.flatnonzero(self.alive)
+        t = self.timesteps[games]
+
+        # Every wall_distance steps, add a new wall.
+        spawn = t % self.wall_distance == 0
+        if spawn.any():
+            self._spawn_walls(games[spawn])
+
+        # Physics, in the same order of operations as the engine
+        flap = np.asarray(actions)[games] == FLAP
+        y_p = np.where(flap, -self.imp, self.y_p[games] + self.g * (1/self.fps))
+        y = self.y[games] + (y_p * (1/self.fps))
+        low = y < 0
+        high = y > self.height-7
+        y[low] = 0
+        y[high] = self.height-7
+        y_p[low | high] = 0
+        self.y[games] = y
+        self.y_p[games] = y_p
+        self.y_start[games] = np.rint(y) # Half to even, like round()
+
+        # Collision with the left and right edge of the wall in front of the penguin
+        crashed_games = self._edge_collision(games, t, 0) | self._edge_collision(games, t, self.wallwidth-1)
+
+        # Scoring: the inside of a wall has been in front of the penguin for wallwidth//2 frames
+        scored_games = (t >= self._score_delay) & ((t - self._score_delay) % self.wall_distance == 0)
+
+        scored = np.zeros(self.n, dtype=bool)
+        crashed = np.zeros(self.n, dtype=bool)
+        scored[games] = scored_games
+        crashed[games] = crashed_games
+        self.score[scored] += 1
+        self.alive[crashed] = False
+        self.crash_frame[crashed] = self.timesteps[crashed]
+        self.timesteps[games] += 1
+        return scored, crashed
+
+    def next_wall(self):
+        """ Finds the first wall of every game that the penguin has not passed yet (like engine.next_wall).
+        Returns:
+            tuple: Three arrays (distance, center, exists). distance is the number of columns between the
+                front of the penguin (x_end) and the left edge of the wall, center its opening_position.
+                exists is False for games without such a wall on the screen.
+        """
+        # Wall number n has its left edge in column width-2-(frame-n*wall_distance) after the last frame,
+        # it has been passed once its right edge is left of x_start.
+        last_frame = self.timesteps - 1
+        passed = last_frame - (self.width - 2 + self.wallwidth - 1 - self.x_start)
+        number = np.maximum(-(-passed // self.wall_distance), 0)
+        exists = number * self.wall_distance <= last_frame
+        distance = (self.width - 2 - (last_frame - number * self.wall_distance)) - self.x_end
+        center = self.openings[np.arange(self.n), number % self.queue_length]
+        return distance, center, exists
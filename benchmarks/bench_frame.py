@@ -0,0 +1,294 @@
+""" Microbenchmarks for the stages of one frame of Pengu Fly.
+
+Every stage is measured for the current code and, where they exist, for the variants in others/
+(git_issue_solve.py still has the original '<U1' string implementation, flying_pengu_optimiert.py
+the list based one). Each case is timed with timeit: the number of calls per repetition is chosen
+with autorange() and the repetitions are summarized with min, median, mean, standard deviation
+and interquartile range, all in nanoseconds per call.
+
+    python benchmarks/bench_frame.py                       # all cases, results in bench_frame.json
+    python benchmarks/bench_frame.py -k render -r 9        # only cases containing "render"
+    python benchmarks/bench_frame.py --compare old.json    # show the change against an earlier run
+"""
+import os
+import sys
+import json
+import time
+import curses
+import random
+import platform
+import argparse
+import statistics
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, 'others'))
+
+import numpy as np
+from helper_functions import SPACE, MAST, draw_wall, get_score_array, check_collision, git_commit
+from engine import GameState, step, compose_frame, new_frame, wall_collision, wall_passed, FLAP, NOOP
+from renderer import Renderer
+from ansi_backend import AnsiRenderer
+from recorder import SessionRecorder
+from autopilot import Autopilot
+import git_issue_solve as legacy
+import flying_pengu_optimiert as optimiert
+
+HEIGHT, WIDTH = 30, 150
+X_START, X_END = 14, 26
+
+
+class FakeScreen:
+    """ Stand-in for a curses window that only counts the calls, so the benchmarks need no terminal. """
+
+    def __init__(self):
+        self.calls = 0
+
+    def getmaxyx(self):
+        return HEIGHT, WIDTH
+
+    def addch(self, row, col, char):
+        self.calls += 1
+
+    def addstr(self, row, col, text):
+        self.calls += 1
+
+    def clear(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+
+class NullTerminal:
+    """ Stand-in for AnsiTerminal that writes the escape sequences to /dev/null. """
+
+    def __init__(self):
+        self.out_fd = os.open(os.devnull, os.O_WRONLY)
+
+    def getmaxyx(self):
+        return HEIGHT, WIDTH
+
+
+def recorded_frames(count=200, seed=1):
+    """ Plays a game headless and returns copies of its frames, to render realistic frame sequences. """
+    state = GameState(1, HEIGHT, WIDTH, seed)
+    frame = new_frame(state)
+    rng = random.Random(seed)
+    frames = []
+    while len(frames) < count:
+        action = FLAP if state.y > 12 and rng.random() < 0.3 else NOOP
+        state, _ = step(state, action)
+        if state.crashed:
+            state.reset(seed)
+        frames.append(compose_frame(state, frame).copy())
+    return frames
+
+
+def cycle(items):
+    """ Returns a function that hands out the items one after the other, forever. """
+    position = [0]
+
+    def next_item():
+        item = items[position[0]]
+        position[0] = (position[0] + 1) % len(items)
+        return item
+    return next_item
+
+
+def legacy_screen():
+    """ Screen as the original game stored it: '<U1' strings with a border and a wall on it. """
+    screen = np.full((HEIGHT, WIDTH), ' ', dtype=str)
+    screen[0, :] = screen[HEIGHT-1, :] = screen[:, 0] = screen[:, WIDTH-1] = '#'
+    for piece in range(1, 9):
+        screen[1:HEIGHT-1, X_START + piece] = legacy.draw_wall(HEIGHT, 8, 12, 15, piece)
+    return screen
+
+
+def cases():
+    """ Builds all benchmark cases.
+    Returns:
+        list: (name, function) pairs, the function runs the stage once.
+    """
+    result = []
+    penguin_art = legacy.Penguin()._wings_up_art
+    penguin_mask = penguin_art != ' '
+
+    # Interior shift
+    state = GameState(1, HEIGHT, WIDTH, 1)
+    result.append(('shift/current', state.playfield.scroll))
+    screen = legacy_screen()
+
+    def shift_legacy():
+        screen[1:HEIGHT-1, 1:WIDTH-2] = screen[1:HEIGHT-1, 2:WIDTH-1]
+        screen[1:HEIGHT-1, WIDTH-2] = ' '
+    result.append(('shift/legacy', shift_legacy))
+    screen_list = optimiert.initialize_screen()
+    result.append(('shift/optimiert', lambda: optimiert.shift_screen_left(screen_list)))
+
+    # Drawing one slice of a wall into the rightmost column
+    column = state.playfield.column(WIDTH-2)
+    result.append(('draw_wall/current', lambda: column.__setitem__(slice(1, HEIGHT-1), draw_wall(HEIGHT, 8, 12, 15, 1))))
+
+    def draw_wall_legacy():
+        wall_piece = legacy.draw_wall(HEIGHT, 8, 12, 15, 1)
+        for i in range(1, HEIGHT-1):
+            screen[i, WIDTH-2] = wall_piece[i-1]
+    result.append(('draw_wall/legacy', draw_wall_legacy))
+
+    # Compositing the play field and the penguin into the frame
+    frame = new_frame(state)
+    result.append(('composite/current', lambda: compose_frame(state, frame)))
+
+    def composite_legacy():
+        screen_pengu = screen.copy()
+        screen_pengu[10:16, X_START:X_END][penguin_mask] = penguin_art[penguin_mask]
+    result.append(('composite/legacy', composite_legacy))
+
+    # Collision check of the penguin's box (with a wall in it)
+    window = np.full((6, 12), SPACE, dtype=np.uint8)
+    window[:, 3] = ord('|')
+    sprite = state.penguin.atlas[1]
+    result.append(('check_collision/current', lambda: check_collision(window, sprite.art)))
+    result.append(('check_collision/take', lambda: ord('|') in np.take(window, sprite.indices(12)).tobytes()))
+    walls_game = GameState(1, HEIGHT, WIDTH, 1)
+    step(walls_game, NOOP)
+    while walls_game.walls[0].x > X_START + 4: # Move the first wall into the penguin's box.
+        step(walls_game, FLAP if walls_game.y > 12 else NOOP)
+        walls_game.crashed = False # Keep going even if the penguin hits it.
+    result.append(('check_collision/geometric', lambda: wall_collision(walls_game)))
+    legacy_window = screen[10:16, X_START:X_END]
+    legacy_composited = legacy_window.copy()
+    legacy_composited[penguin_mask] = penguin_art[penguin_mask]
+    result.append(('check_collision/legacy', lambda: legacy.check_collision(legacy_window, legacy_composited)))
+    mask_list = penguin_mask.tolist()
+    result.append(('check_collision/optimiert', lambda: optimiert.check_collision_optimized(screen_list, penguin_art, 10, X_START, mask_list)))
+
+    # Score scan of the column in front of the penguin
+    result.append(('score_scan/current', lambda: wall_passed(walls_game)))
+    result.append(('score_scan/characters', lambda: MAST in state.playfield.column(X_END).tobytes()))
+    result.append(('score_scan/legacy', lambda: '_' in screen[:, X_END]))
+    result.append(('score_scan/optimiert', lambda: any(screen_list[row][X_END] == '_' for row in range(HEIGHT))))
+
+    # Score text of the HUD
+    scores = cycle([12] * 99 + [13]) # The score changes rarely
+    result.append(('get_score_array/current', lambda: get_score_array(scores())))
+    result.append(('get_score_array/legacy', lambda: legacy.get_score_array(scores())))
+
+    # Rendering a sequence of game frames
+    frames = recorded_frames()
+    renderer = Renderer(FakeScreen())
+    next_frame = cycle(frames)
+    result.append(('render/current', lambda: renderer.draw(next_frame())))
+    ansi_renderer = AnsiRenderer(NullTerminal())
+    next_ansi_frame = cycle(frames)
+    result.append(('render/ansi', lambda: ansi_renderer.draw(next_ansi_frame())))
+    # Session capture (--capture): delta encoding plus the buffered write
+    capture = SessionRecorder(os.devnull)
+    next_capture_frame = cycle(frames)
+    result.append(('render/capture', lambda: capture.record(next_capture_frame())))
+    legacy_frames = [np.array([list(row.tobytes().decode()) for row in f]) for f in frames[:20]]
+    next_legacy = cycle(legacy_frames)
+    fake = FakeScreen()
+
+    def render_legacy():
+        screen_pengu = next_legacy()
+        fake.clear()
+        for row in range(HEIGHT):
+            for col in range(WIDTH):
+                fake.addch(row, col, screen_pengu[row, col])
+        fake.refresh()
+    result.append(('render/legacy', render_legacy))
+    list_frames = [f.tolist() for f in legacy_frames]
+    next_list = cycle(list_frames)
+    result.append(('render/optimiert', lambda: optimiert.display_screen(fake, next_list())))
+
+    # One complete headless frame of the engine
+    game = GameState(3, HEIGHT, WIDTH, 2)
+
+    def engine_step():
+        if game.crashed:
+            game.reset(2)
+        step(game, FLAP if game.y > 12 else NOOP)
+    result.append(('frame/engine_step', engine_step))
+    # Choosing the action with the autopilot (a check of the action against the sweep, plus a part of the next sweep)
+    pilot_game = GameState(3, HEIGHT, WIDTH, 2)
+    pilot = Autopilot()
+
+    def autopilot_step():
+        if pilot_game.crashed:
+            pilot_game.reset(2)
+        step(pilot_game, pilot.action(pilot_game))
+    result.append(('frame/autopilot_step', autopilot_step))
+    result.append(('frame/engine_step+compose+render', lambda: (engine_step(), renderer.draw(compose_frame(game, frame)))))
+    return result
+
+
+def measure(function, repeat, min_time):
+    """ Times a function with timeit.
+    Returns:
+        dict: Statistics in nanoseconds per call.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2)) # autorange aims for at least 0.2 s
+    times = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [times[0]] * 3
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min_ns': min(times),
+        'median_ns': statistics.median(times),
+        'mean_ns': statistics.fmean(times),
+        'stdev_ns': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'iqr_ns': quartiles[2] - quartiles[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the per-frame stages of Pengu Fly.")
+    parser.add_argument('-k', '--filter', default='', help="only run the cases whose name contains this text")
+    parser.add_argument('-r', '--repeat', type=int, default=7, help="repetitions per case (default: 7)")
+    parser.add_argument('-t', '--min-time', type=float, default=0.2, help="seconds per repetition (default: 0.2)")
+    parser.add_argument('-o', '--output', default='bench_frame.json', help="result file (default: bench_frame.json)")
+    parser.add_argument('--compare', metavar='FILE', help="earlier result file to compare the medians with")
+    args = parser.parse_args(argv)
+
+    # The renderer flushes with curses.doupdate(), which needs a real terminal.
+    curses.doupdate = lambda: None
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    for name, function in cases():
+        if args.filter not in name:
+            continue
+        stats = measure(function, args.repeat, args.min_time)
+        results[name] = stats
+        line = f"{name:40s} {stats['median_ns']:12.0f} ns  (min {stats['min_ns']:.0f}, iqr {stats['iqr_ns']:.0f})"
+        if name in baseline:
+            line += f"  {stats['median_ns'] / baseline[name]['median_ns']:6.2f}x vs {args.compare}"
+        print(line)
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+""" Load test of the spectator server: a game loop on the schedule of Hard streams to many viewers.
+
+The viewers run in separate processes and read every message they get. The game loop steps, composes
+and publishes one frame per tick and sleeps until the next one, like flying_pengu.py. Reported are the
+time publish() takes, how late the loop wakes up for its ticks (with and without viewers) and how
+many frames the viewers received.
+
+    python benchmarks/bench_spectator.py                   # 200 viewers on a Unix socket, 10 seconds
+    python benchmarks/bench_spectator.py -n 400 --tcp 47000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import selectors
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from engine import GameState, step, compose_frame, new_frame, DIFFICULTIES, FLAP, NOOP
+from spectator import SpectatorServer, SpectatorClient
+
+
+def viewers(address, count, ready, results):
+    """ Viewer process: connects count viewers and reads their messages until the server closes. """
+    clients = [SpectatorClient(address) for _ in range(count)]
+    selector = selectors.DefaultSelector()
+    for index, client in enumerate(clients):
+        selector.register(client.sock, selectors.EVENT_READ, index)
+    ready.put(count)
+    received = [0] * count
+    while selector.get_map():
+        for key, _ in selector.select():
+            try:
+                clients[key.data].receive()
+                received[key.data] += 1
+            except ConnectionError:
+                selector.unregister(key.fileobj)
+    results.put(received)
+
+
+def game_loop(seconds, server=None):
+    """ Plays Hard for some seconds with a fixed schedule.
+    Returns:
+        tuple: (publish times, wake-up delays) in seconds.
+    """
+    state = GameState(3, 30, 150, 1)
+    frame = new_frame(state)
+    fps = DIFFICULTIES[3]['fps']
+    publish, late = [], []
+    start = time.perf_counter()
+    for tick in range(1, int(seconds * fps) + 1):
+        state, _ = step(state, FLAP if tick % 9 == 0 else NOOP)
+        if state.crashed:
+            state.reset(tick)
+        compose_frame(state, frame)
+        if server is not None:
+            begin = time.perf_counter()
+            server.publish(frame)
+            publish.append(time.perf_counter() - begin)
+        deadline = start + tick / fps
+        time.sleep(max(deadline - time.perf_counter(), 0))
+        late.append(time.perf_counter() - deadline)
+    return publish, late
+
+
+def percentiles(values):
+    return "p50 %7.3f ms  p99 %7.3f ms  max %7.3f ms" % tuple(x * 1e3 for x in (np.percentile(values, 50), np.percentile(values, 99), max(values)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of the Pengu Fly spectator server.")
+    parser.add_argument('-n', '--viewers', type=int, default=200, help="number of viewers (default: 200)")
+    parser.add_argument('-p', '--processes', type=int, default=4, help="viewer processes (default: 4)")
+    parser.add_argument('-s', '--seconds', type=float, default=10, help="length of the game (default: 10)")
+    parser.add_argument('--tcp', type=int, metavar='PORT', help="use a local TCP port instead of a Unix socket")
+    args = parser.parse_args(argv)
+
+    address = str(args.tcp) if args.tcp else os.path.join(tempfile.mkdtemp(), 'spectate.sock')
+    _, baseline = game_loop(args.seconds)
+
+    server = SpectatorServer(address)
+    ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=viewers, args=(address, count, ready, results))
+                 for count in np.diff(np.linspace(0, args.viewers, args.processes + 1).astype(int)) if count]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get()
+    publish, late = game_loop(args.seconds, server)
+    connected = server.viewers
+    server.close()
+    received = [count for _ in processes for count in results.get()]
+    for process in processes:
+        process.join()
+
+    frames = len(late)
+    print(f"{connected} viewers, {frames} frames at {DIFFICULTIES[3]['fps']} fps")
+    print(f"publish()              {percentiles(publish)}")
+    print(f"wake-up delay          {percentiles(late)}")
+    print(f"wake-up delay, alone   {percentiles(baseline)}")
+    print(f"frames per viewer      min {min(received)}  mean {sum(received) / len(received):.1f}  (skipped frames are merged into the next message)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+""" Time to first frame: how long a player waits for the start screen after launching the game.
+
+The game is started like the kiosk does (python3 flying_pengu.py) on a pseudo terminal of 150x30,
+the clock stops when the title of the start screen arrives on the terminal, then ESC quits the game.
+The launches are summarized with min, median, 90th percentile and max. For comparison the startup of
+a bare interpreter (python -c pass) is measured the same way. Linux and macOS only (pseudo terminals).
+
+The benchmark fails (exit status 1) if the median is over the budget, so it can guard against
+startup regressions, e.g. an import of NumPy before the start screen is drawn.
+
+    python benchmarks/bench_startup.py                     # 20 launches, budget 100 ms
+    python benchmarks/bench_startup.py -n 50 --budget 80 -- --backend ansi
+"""
+import os
+import sys
+import time
+import pty
+import fcntl
+import struct
+import select
+import termios
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEIGHT, WIDTH = 30, 150
+TITLE = b'Pengu Fly' # First line of the start screen
+TIMEOUT = 10 # Seconds to wait for the start screen
+
+
+def launch(arguments, marker=TITLE):
+    """ Starts a program on a new pseudo terminal and waits until marker is written to it.
+    Args:
+        arguments (list): The command line after the interpreter.
+        marker (bytes): Output to wait for, None to wait for the program to exit.
+    Returns:
+        float: Seconds from starting the process until the marker arrived.
+    Raises:
+        RuntimeError: If the marker did not arrive.
+    """
+    master, slave = pty.openpty()
+    fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', HEIGHT, WIDTH, 0, 0))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *arguments], stdin=slave, stdout=slave, stderr=slave,
+                               cwd=ROOT, start_new_session=True, env=dict(os.environ, TERM=os.environ.get('TERM', 'xterm')))
+    os.close(slave)
+    output = b''
+    elapsed = None
+    try:
+        while elapsed is None:
+            if not select.select([master], [], [], TIMEOUT)[0]:
+                break
+            try:
+                data = os.read(master, 1 << 16)
+            except OSError: # The program exited and closed the terminal.
+                data = b''
+            if not data:
+                if marker is None:
+                    elapsed = time.perf_counter() - start
+                break
+            output += data
+            if marker is not None and marker in output:
+                elapsed = time.perf_counter() - start
+        if marker is not None and elapsed is not None:
+            os.write(master, b'\x1b') # ESC on the start screen quits the game
+            while select.select([master], [], [], TIMEOUT)[0]:
+                try:
+                    if not os.read(master, 1 << 16):
+                        break
+                except OSError:
+                    break
+    finally:
+        process.wait(TIMEOUT)
+        os.close(master)
+    if elapsed is None:
+        raise RuntimeError(f"no start screen after {TIMEOUT} s, output: {output[-500:]!r}")
+    return elapsed
+
+
+def summary(times):
+    """ Returns min, median, 90th percentile and max of durations in milliseconds as text. """
+    times = sorted(duration * 1e3 for duration in times)
+    p90 = statistics.quantiles(times, n=10, method='inclusive')[8] if len(times) > 1 else times[0]
+    return f"min {times[0]:6.1f} ms  median {statistics.median(times):6.1f} ms  p90 {p90:6.1f} ms  max {times[-1]:6.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the time from launching Pengu Fly until the start screen is shown.")
+    parser.add_argument('-n', '--launches', type=int, default=20, help="number of launches (default: 20)")
+    parser.add_argument('--budget', type=float, default=100, help="largest allowed median in milliseconds (default: 100)")
+    parser.add_argument('game_args', nargs='*', help="options for flying_pengu.py (after --)")
+    args = parser.parse_args(argv)
+
+    launch(['flying_pengu.py', *args.game_args]) # Warm up the file system cache and the .pyc files
+    interpreter = [launch(['-c', 'pass'], marker=None) for _ in range(args.launches)]
+    game = [launch(['flying_pengu.py', *args.game_args]) for _ in range(args.launches)]
+    print(f"python -c pass      {summary(interpreter)}")
+    print(f"time to first frame {summary(game)}")
+
+    median = statistics.median(game) * 1e3
+    if median > args.budget:
+        print(f"FAIL: median time to first frame {median:.1f} ms is over the budget of {args.budget:g} ms")
+        return 1
+    print(f"OK: median time to first frame {median:.1f} ms is within the budget of {args.budget:g} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
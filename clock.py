@@ -0,0 +1,53 @@
+import time
+
+
+class FixedStepClock:
+    """ Schedules simulation ticks at a fixed rate, independent of how long rendering takes.
+
+    Tick k is due at start + k/tick_rate. After a slow frame the game loop runs all ticks that are
+    due (at most max_catch_up at once, older ticks are dropped so the game does not spiral), then
+    renders once. wait() sleeps until the next tick is due, the last spin_time seconds are spent
+    spinning on time.perf_counter() because time.sleep() often oversleeps by a millisecond or more.
+    """
+
+    def __init__(self, tick_rate, max_catch_up=5, spin_time=0.002):
+        self.tick_rate = tick_rate
+        self.dt = 1/tick_rate # seconds per tick
+        self.max_catch_up = max_catch_up
+        self.spin_time = spin_time
+        self.dropped = 0 # ticks skipped because the game fell too far behind
+        self.reset()
+
+    def reset(self):
+        """ Starts counting ticks from now, e.g. at the start of a game or after the pause screen. """
+        self.start = time.perf_counter()
+        self.ticks = 0 # ticks handed out since start
+
+    def ticks_due(self):
+        """ Returns the number of ticks to simulate now (0 to max_catch_up). """
+        due = int((time.perf_counter() - self.start) * self.tick_rate) + 1 - self.ticks
+        if due > self.max_catch_up:
+            # Too far behind: drop the oldest ticks by moving the start of the schedule.
+            skipped = due - self.max_catch_up
+            self.start += skipped * self.dt
+            self.dropped += skipped
+            due = self.max_catch_up
+        self.ticks += max(due, 0)
+        return max(due, 0)
+
+    def next_deadline(self):
+        """ Returns the perf_counter() time at which the next tick is due. """
+        return self.start + self.ticks * self.dt
+
+    def wait(self):
+        """ Sleeps until the next tick is due.
+        Returns:
+            float: How late in seconds the clock woke up (0 if on time).
+        """
+        deadline = self.next_deadline()
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_time:
+            time.sleep(remaining - self.spin_time)
+        while time.perf_counter() < deadline:
+            time.sleep(0) # Give other threads a chance while spinning.
+        return max(time.perf_counter() - deadline, 0)
@@ -0,0 +1,142 @@
+""" Checks that the different implementations of the rules of Pengu Fly agree with engine.step().
+
+- BatchSimulator (batch.py) derives collisions and scores from the frames the walls were spawned in.
+  Its games are played in lockstep with engine games with the same inputs. Its openings are taken from
+  the engine games, because the two use different random number generators. After every step the
+  penguin (height, velocity, row), the scores and the crashes have to be identical.
+- The engine finds collisions and scores from the wall geometry. With cross_check=True it also
+  finds them from the characters of the play field, the way the game originally did, and raises
+  AssertionError if the two disagree.
+
+Every difficulty is played on several screen sizes. Half the games are flown by the autopilot, which
+survives long and passes many walls. The other half tap at random and crash in all kinds of ways.
+
+    python consistency.py                  # 40 games per difficulty and screen size
+    python consistency.py -n 200 --frames 5000
+
+The exit status is 1 if an implementation disagrees.
+"""
+import sys
+import argparse
+import numpy as np
+from engine import GameState, step, DIFFICULTIES, EVENT_SCORE, EVENT_CRASH
+from batch import BatchSimulator
+from autopilot import Autopilot
+from tournament import RandomTapper
+
+SIZES = ((30, 150), (20, 60), (45, 200)) # (height, width) of the screens to play on
+
+
+class ScriptedBatch(BatchSimulator):
+    """ BatchSimulator that takes the openings of its walls from engine games instead of drawing them.
+    Openings outside of the bounds of the placement rule of the batch simulator raise AssertionError.
+    """
+
+    def __init__(self, states):
+        first = states[0]
+        super().__init__(len(states), first.difficulty, first.height, first.width)
+        self.states = states
+
+    def _spawn_walls(self, games):
+        centers = np.array([self.states[game].walls[-1].opening_position for game in games])
+        last_center = self.last_center[games]
+        upper_bound = np.minimum(last_center + self.offset, self.height - 2 - self._half_opening - 1)
+        lower_bound = np.maximum(last_center - self.offset, self._half_opening + 1)
+        if np.any((centers < lower_bound) | (centers > upper_bound)):
+            raise AssertionError("the engine placed a wall outside of the bounds of the batch simulator")
+        wall_number = self.timesteps[games] // self.wall_distance
+        self.openings[games, wall_number % self.queue_length] = centers
+        self.last_center[games] = centers
+
+
+def players(count, seed):
+    """ Returns the players of count games: the autopilot for even games, random tapping for odd ones. """
+    return [Autopilot() if game % 2 == 0 else RandomTapper(3, seed + game) for game in range(count)]
+
+
+def compare_batch(difficulty, height, width, count, frames, seed):
+    """ Plays count games with the engine and with the batch simulator in lockstep.
+    Returns:
+        list: Descriptions of the differences, empty if the two agree.
+    """
+    states = [GameState(difficulty, height, width, seed + game) for game in range(count)]
+    pilots = players(count, seed)
+    batch = ScriptedBatch(states)
+    actions = np.zeros(count, dtype=np.int64)
+    scored = np.zeros(count, dtype=bool)
+    crashed = np.zeros(count, dtype=bool)
+    errors = []
+    for frame in range(frames):
+        running = np.array([not state.crashed for state in states])
+        if not running.any():
+            break
+        for game in np.flatnonzero(running):
+            actions[game] = pilots[game].action(states[game])
+            _, events = step(states[game], actions[game])
+            scored[game] = bool(events & EVENT_SCORE)
+            crashed[game] = bool(events & EVENT_CRASH)
+        batch_running = batch.alive.copy()
+        batch_scored, batch_crashed = batch.step(actions)
+
+        for game in np.flatnonzero(running):
+            state = states[game]
+            where = f"difficulty {difficulty}, {width}x{height}, seed {seed + game}, frame {frame}"
+            if not batch_running[game]:
+                errors.append(f"{where}: the game runs in the engine, but crashed before in the batch")
+            elif (batch.y[game], batch.y_p[game], batch.y_start[game]) != (state.y, state.y_p, state.y_start):
+                errors.append(f"{where}: penguin at y={state.y!r}, y_p={state.y_p!r} (row {state.y_start}) in the engine, "
+                              f"y={batch.y[game]!r}, y_p={batch.y_p[game]!r} (row {batch.y_start[game]}) in the batch")
+            elif (batch_scored[game], batch_crashed[game]) != (scored[game], crashed[game]):
+                errors.append(f"{where}: scored={scored[game]}, crashed={crashed[game]} in the engine, "
+                              f"scored={batch_scored[game]}, crashed={batch_crashed[game]} in the batch")
+            else:
+                continue
+            state.crashed = True # Stop the game, so every game is reported only once
+            batch.alive[game] = False
+        for game in np.flatnonzero(~running & batch_running):
+            errors.append(f"difficulty {difficulty}, {width}x{height}, seed {seed + game}, frame {frame}: "
+                          "the game crashed before in the engine, but runs in the batch")
+            batch.alive[game] = False
+    return errors
+
+
+def cross_check(difficulty, height, width, count, frames, seed):
+    """ Plays count engine games with cross_check=True.
+    Returns:
+        list: Descriptions of the frames in which the characters disagree with the geometry.
+    """
+    errors = []
+    state = GameState(difficulty, height, width, cross_check=True)
+    for game, pilot in enumerate(players(count, seed)):
+        state.reset(seed + game)
+        try:
+            while not state.crashed and state.timesteps < frames:
+                step(state, pilot.action(state))
+        except AssertionError as error:
+            errors.append(f"difficulty {difficulty}, {width}x{height}, seed {seed + game}: {error}")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the batch simulator and the character based rules agree with the engine.")
+    parser.add_argument('-n', '--games', type=int, default=40, help="games per difficulty and screen size (default: 40)")
+    parser.add_argument('--frames', type=int, default=2000, help="longest game in frames (default: 2000)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for check in (compare_batch, cross_check):
+        errors = []
+        for difficulty in DIFFICULTIES:
+            for height, width in SIZES:
+                errors += check(difficulty, height, width, args.games, args.frames, args.seed)
+        games = args.games * len(DIFFICULTIES) * len(SIZES)
+        print(f"{check.__name__}: {games} games, {len(errors)} differences")
+        for error in errors[:20]:
+            print(f"  {error}")
+        failed |= bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
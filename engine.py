@@ -0,0 +1,297 @@
+import collections
+import random
+import numpy as np
+from wall import Wall
+from penguin import Penguin
+from playfield import PlayField
+from helper_functions import SPACE, BORDER, WALL, MAST, draw_wall, get_score_array
+from menus import MIN_HEIGHT, MIN_WIDTH # Smallest screen of a game, defined next to the start screen so the front end has it before NumPy
+
+# Actions for step()
+NOOP = 0 # Let the penguin fall
+FLAP = 1 # Make the penguin jump (SPACE)
+
+# Events returned by step(), combined as bit flags
+EVENT_WALL = 1 # A new wall was spawned at the right edge
+EVENT_SCORE = 2 # The penguin passed a wall
+EVENT_CRASH = 4 # The penguin hit a wall, the game is over
+
+# Settings of the difficulty levels (frames per second, height of the openings, distance between walls,
+# maximum vertical offset of the centers of consecutive openings)
+WALLWIDTH = 8
+DIFFICULTIES = {
+    1: {'fps': 30, 'opening_height': 12, 'wall_distance': 40 + WALLWIDTH, 'offset': 6},
+    2: {'fps': 40, 'opening_height': 10, 'wall_distance': 40 + WALLWIDTH, 'offset': 6},
+    3: {'fps': 50, 'opening_height': 10, 'wall_distance': 30 + WALLWIDTH, 'offset': 6},
+}
+
+# The penguin flaps its wings every FLAP_PERIOD seconds, independent of the difficulty.
+FLAP_PERIOD = 1/3
+
+
+def flap_ticks(fps):
+    """ Returns the number of simulation ticks between two wing beats at a tick rate. """
+    return max(1, round(FLAP_PERIOD * fps))
+
+
+class GameState:
+    """ Complete state of one game of Pengu Fly, without any dependency on curses or the clock.
+    Advance it with step() and draw it with compose_frame().
+
+    Every step is one simulation tick of 1/fps seconds (fps is the tick rate of the difficulty): the walls
+    move one column and the physics are integrated over 1/fps seconds. How often the game is drawn
+    is up to the front end.
+    """
+
+    def __init__(self, difficulty=1, height=30, width=150, seed=None, cross_check=False):
+        self.height = height # Height and width of the screen.
+        self.width = width
+        self.rng = random.Random() # Random number generator for the walls of this game
+        self.playfield = PlayField(height, width) # Scrolling walls (circular column buffer)
+        self.penguin = Penguin() # Create a penguin object (its sprite atlas has the art, mask and indices of every frame).
+        self.cross_check = cross_check # Debug: also find collisions and scores from the characters
+        self.set_difficulty(difficulty)
+        self.reset(seed)
+
+    def set_difficulty(self, difficulty, **overrides):
+        """ Applies the settings of a difficulty level (1 - Easy, 2 - Medium, 3 - Hard).
+        Args:
+            difficulty (int): The difficulty level.
+            **overrides: Settings that replace the ones of the level (any key of DIFFICULTIES), for tuning.
+        """
+        self.difficulty = difficulty
+        settings = {**DIFFICULTIES[difficulty], **overrides}
+        self.fps = settings['fps'] # simulation ticks per second
+        self.penguin.flap_ticks = flap_ticks(self.fps)
+        self.opening_height = settings['opening_height'] # height of the opening in the wall
+        self.wall_distance = settings['wall_distance'] # horizontal distance between consecutive walls
+        self.offset = settings['offset'] # maximum vertical offset of the center points of consecutive walls
+
+    def reset(self, seed=None):
+        """ Starts a new game with the current difficulty, reusing all buffers.
+        Args:
+            seed (int, optional): Seed for the walls of the game. A random seed is chosen if None.
+        """
+        # Every game has its own seed, so it can be replayed from the seed and the inputs.
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.playfield.clear()
+
+        # Variables for the walls
+        self.timesteps = 0 # Number of timesteps since the start of the game
+        self.wallwidth = WALLWIDTH # width of the wall
+        self.last_center = self.height//2 # initial center point of the opening
+        self.start_draw_wall = False # flag to start drawing a new wall
+        self.draw_wall_width = 0 # width of the wall being drawn
+        self.current_wall = None # current wall object
+        self.walls = collections.deque() # walls that are still on the screen, oldest first (with their column x)
+        self.first_wall = 0 # number of the wall walls[0] (walls are numbered in the order they are spawned)
+
+        # Current score, mastcount for the character based score (only counted with cross_check) and game over flag
+        self.score = 0
+        self.mastcount = 0
+        self.crashed = False
+
+        # gravity and impulse
+        self.g = 5*9.81
+        self.imp = 20
+
+        # Initialization of the starting position of the penguin
+        # going to track the upper left corner of the penguin
+        self.y_start = 7
+        self.y_end = 13
+        self.x_start = 14
+        self.x_end = 26
+        self.y = self.y_start
+        self.y_p = 0
+
+        # Penguin animation
+        self.penguin.reset()
+
+
+def step(state, action):
+    """ Advances the game by one frame. The state is updated in place.
+    Args:
+        state (GameState): The game to advance.
+        action (int): FLAP to jump, NOOP to fall.
+    Returns:
+        tuple: (state, events), where events is a combination of the EVENT_* flags.
+    """
+    if state.crashed:
+        return state, 0
+    events = 0
+    height = state.height
+    playfield = state.playfield
+
+    # Shift the interior (non-border) left by one column and clear the new rightmost interior column.
+    # The walls move along with it.
+    playfield.scroll()
+    for wall in state.walls:
+        wall.x -= 1
+
+    # Every wall_distance steps, add a new wall in the new rightmost interior column.
+    if state.timesteps % state.wall_distance == 0:
+        state.start_draw_wall = True
+        state.current_wall = Wall(height-2, state.wallwidth, state.opening_height, state.offset, state.last_center, state.rng, state.width-2) # Create a new wall object.
+        state.last_center = state.current_wall.opening_position # Update the last center point.
+        state.walls.append(state.current_wall)
+        events |= EVENT_WALL
+
+    # Draw the wall in the new rightmost interior column.
+    if state.start_draw_wall:
+        state.draw_wall_width += 1
+        if state.draw_wall_width <= state.wallwidth:
+            wall_piece = draw_wall(height, state.wallwidth, state.opening_height, state.last_center, state.draw_wall_width)
+            playfield.column(state.width-2)[1:height-1] = wall_piece
+        else:
+            state.draw_wall_width = 0
+            state.start_draw_wall = False
+
+    # if the penguin flaps, velocity is set to -imp, otherwise it increases by the gravitational force
+    if action == FLAP:
+        state.y_p = - state.imp
+    else:
+        state.y_p = state.y_p + state.g * (1/state.fps)
+
+    # update the position of the penguin
+    state.y = state.y + (state.y_p * (1/state.fps))
+
+    # check if the penguin is out of the screen
+    if state.y < 0:
+        state.y = 0
+        state.y_p = 0
+    elif state.y > height-7:
+        state.y = height-7
+        state.y_p = 0
+
+    # update the position of the penguin
+    state.y_start = round(state.y)
+    state.y_end = state.y_start+6
+    state.penguin.fly()
+
+    # Check for collision between the penguin and the walls, and if the penguin passed a wall.
+    if wall_collision(state):
+        state.crashed = True
+        events |= EVENT_CRASH
+    if wall_passed(state):
+        state.score += 1
+        events |= EVENT_SCORE
+    if state.cross_check:
+        check_characters(state, events)
+
+    state.timesteps += 1
+
+    # Forget the oldest wall once its right edge has left the screen.
+    if state.walls[0].x + state.wallwidth - 1 < 1:
+        state.walls.popleft()
+        state.first_wall += 1
+    return state, events
+
+
+def wall_collision(state):
+    """ Checks if the penguin hits the edge of a wall. Only the few walls on the screen are tested, with
+    interval tests of the edge columns against the runs of visible cells of the penguin in the blocked rows.
+    Args:
+        state (GameState): The game.
+    Returns:
+        bool: True if the penguin collided.
+    """
+    sprite = state.penguin.sprite
+    top, bottom, left, right = sprite.bbox
+    for wall in state.walls:
+        if wall.opening_top <= state.y_start + top and state.y_start + bottom <= wall.opening_bottom:
+            continue # The penguin is completely inside the opening.
+        for edge in wall.edges():
+            column = edge - state.x_start # column of the edge in the penguin's art
+            if left <= column < right:
+                for row in range(top, bottom):
+                    if wall.blocks(state.y_start + row) and any(start <= column < end for start, end in sprite.runs[row]):
+                        return True
+    return False
+
+
+def wall_passed(state):
+    """ Checks if the penguin passed a wall in this step: the middle of the wall (wallwidth//2 columns
+    behind its left edge) is in the column in front of the penguin.
+    Args:
+        state (GameState): The game.
+    Returns:
+        bool: True if the penguin scores a point.
+    """
+    for wall in state.walls:
+        if state.x_end - wall.x == wall.width//2:
+            return True
+    return False
+
+
+def check_characters(state, events):
+    """ Debug cross-check of the geometric collision and score against the characters of the play field,
+    the way the game originally found them: a '|' behind a visible cell of the penguin, and wallwidth//2
+    consecutive frames with a '_' in the column in front of the penguin.
+    Args:
+        state (GameState): The game, after the collision and score of this step.
+        events (int): The events found by wall_collision() and wall_passed().
+    Raises:
+        AssertionError: If the characters disagree with the geometry.
+    """
+    behind = state.playfield.window(state.y_start, state.y_end, state.x_start, state.x_end)
+    # Gather the cells behind the visible cells of the penguin.
+    sprite = state.penguin.sprite
+    crashed = WALL in np.take(behind, sprite.indices(behind.shape[1])).tobytes()
+    if MAST in state.playfield.column(state.x_end).tobytes():
+        state.mastcount += 1
+    else:
+        state.mastcount = 0
+    scored = state.mastcount == state.wallwidth//2
+    if crashed != bool(events & EVENT_CRASH) or scored != bool(events & EVENT_SCORE):
+        raise AssertionError(f"frame {state.timesteps}: characters say crashed={crashed}, scored={scored}, "
+                             f"walls say crashed={bool(events & EVENT_CRASH)}, scored={bool(events & EVENT_SCORE)}")
+
+
+def next_wall(state):
+    """ Finds the first wall on the screen that the penguin has not passed yet.
+    Args:
+        state (GameState): The game.
+    Returns:
+        tuple: (distance, wall) with the number of columns between the front of the penguin (x_end)
+            and the left edge of the wall (negative while the penguin is inside the wall),
+            or (None, None) if there is no such wall.
+    """
+    for wall in state.walls:
+        if wall.x + wall.width - 1 >= state.x_start:
+            return wall.x - state.x_end, wall
+    return None, None
+
+
+def compose_frame(state, frame):
+    """ Draws the game into a frame: play field, penguin, score and border.
+    Args:
+        state (GameState): The game to draw.
+        frame (np.ndarray): A uint8 array of shape (height, width) that is overwritten.
+    Returns:
+        np.ndarray: The frame.
+    """
+    # Copy the play field into the frame in screen order.
+    state.playfield.compose(frame)
+
+    # Scatter the visible cells of the penguin into the frame (the frame is C-contiguous, so flat indices work).
+    sprite = state.penguin.sprite
+    np.put(frame, sprite.indices(state.width) + (state.y_start*state.width + state.x_start), sprite.values)
+
+    # Show score in the top left corner
+    score_array = get_score_array(state.score)
+    frame[1, 2:2+len(score_array)] = score_array
+
+    # Reapply border (overwrite any changes in the border area).
+    frame[0, :] = BORDER
+    frame[state.height-1, :] = BORDER
+    frame[:, 0] = BORDER
+    frame[:, state.width-1] = BORDER
+    return frame
+
+
+def new_frame(state):
+    """ Allocates a frame buffer that fits a game. """
+    return np.full((state.height, state.width), SPACE, dtype=np.uint8)
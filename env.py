@@ -0,0 +1,141 @@
+import numpy as np
+from engine import GameState, step, compose_frame, new_frame, next_wall, EVENT_SCORE, EVENT_CRASH
+from batch import BatchSimulator
+
+# Entries of the feature vector
+FEATURES = ('y', 'velocity', 'wall_distance', 'opening_top', 'opening_bottom')
+
+
+class PenguEnv:
+    """ Gym-style environment for one game of Pengu Fly.
+
+    Actions are NOOP (0) and FLAP (1). The observation is a feature vector (see FEATURES): the penguin's
+    height and velocity, the distance from the front of the penguin to the next wall and the first and
+    last free row of its opening. Without a wall ahead the distance is width-x_end and the whole column is free.
+    The reward is 1 for every wall passed and -1 for crashing, which ends the episode.
+
+    Observations are views of buffers owned by the environment and are overwritten by the next step.
+    Copy them to keep them.
+    """
+
+    def __init__(self, difficulty=1, height=30, width=150):
+        self.state = GameState(difficulty, height, width)
+        self._features = np.zeros(len(FEATURES))
+        self._frame = new_frame(self.state)
+        self._frame_dirty = True # The frame is only composed when the screen is requested.
+
+        # Read-only views handed out to the caller
+        self.features = self._features.view()
+        self.features.flags.writeable = False
+        self._screen = self._frame.view()
+        self._screen.flags.writeable = False
+
+    @property
+    def screen(self):
+        """ Read-only view of the screen (uint8, one ASCII byte per cell) after the last step. """
+        if self._frame_dirty:
+            compose_frame(self.state, self._frame)
+            self._frame_dirty = False
+        return self._screen
+
+    def _observe(self):
+        """ Updates the feature vector from the game state. """
+        state = self.state
+        features = self._features
+        features[0] = state.y
+        features[1] = state.y_p
+        distance, wall = next_wall(state)
+        if wall is None:
+            features[2] = state.width - state.x_end
+            features[3] = 1
+            features[4] = state.height - 2
+        else:
+            features[2] = distance
+            features[3] = wall.opening_top
+            features[4] = wall.opening_bottom - 1
+        self._frame_dirty = True
+        return self.features
+
+    def reset(self, seed=None):
+        """ Starts a new game.
+        Args:
+            seed (int, optional): Seed for the placement of the walls, a random seed if None.
+        Returns:
+            np.ndarray: The feature vector.
+        """
+        self.state.reset(seed)
+        return self._observe()
+
+    def step(self, action):
+        """ Advances the game by one frame.
+        Args:
+            action (int): FLAP or NOOP.
+        Returns:
+            tuple: (features, reward, done, info), info contains the score and the EVENT_* flags of the frame.
+        """
+        state, events = step(self.state, action)
+        reward = 0.0
+        if events & EVENT_SCORE:
+            reward += 1.0
+        if events & EVENT_CRASH:
+            reward -= 1.0
+        return self._observe(), reward, state.crashed, {'score': state.score, 'events': events}
+
+
+class VectorEnv:
+    """ Batched version of PenguEnv on top of BatchSimulator, with one row of features per game.
+
+    Games that crash are restarted automatically in the same step, the returned features of those
+    games already belong to the new game. There is no screen in the batched version.
+    """
+
+    def __init__(self, n, difficulty=1, height=30, width=150, seed=None):
+        self.n = n
+        self.sim = BatchSimulator(n, difficulty, height, width, seed)
+        self._features = np.zeros((n, len(FEATURES)))
+        self._rewards = np.zeros(n)
+        self.features = self._features.view()
+        self.features.flags.writeable = False
+        self.rewards = self._rewards.view()
+        self.rewards.flags.writeable = False
+
+    def _observe(self):
+        """ Updates the features of all games from the simulator. """
+        sim = self.sim
+        features = self._features
+        half = sim._half_opening
+        distance, center, exists = sim.next_wall()
+        features[:, 0] = sim.y
+        features[:, 1] = sim.y_p
+        features[:, 2] = np.where(exists, distance, sim.width - sim.x_end)
+        features[:, 3] = np.where(exists, center - half + 1, 1)
+        features[:, 4] = np.where(exists, center + half, sim.height - 2)
+        return self.features
+
+    def reset(self, seed=None):
+        """ Starts new games in all slots.
+        Args:
+            seed (int, optional): Seed for the placement of the walls.
+        Returns:
+            np.ndarray: The features, shape (n, len(FEATURES)).
+        """
+        if seed is not None:
+            self.sim.rng = np.random.default_rng(seed)
+        self.sim.reset()
+        return self._observe()
+
+    def step(self, actions):
+        """ Advances all games by one frame.
+        Args:
+            actions (np.ndarray): One action (FLAP or NOOP) per game.
+        Returns:
+            tuple: (features, rewards, dones, scores). scores holds the final score of the games that
+                ended in this step (0 for the others).
+        """
+        scored, crashed = self.sim.step(actions)
+        self._rewards[:] = scored
+        self._rewards[crashed] -= 1.0
+        scores = np.where(crashed, self.sim.score, 0)
+        if crashed.any():
+            self.sim.reset(crashed)
+        return self._observe(), self.rewards, crashed, scores
@@ -1,263 +1,334 @@
 import time
 import curses
-import numpy as np
-from wall import Wall
-from penguin import Penguin
-from helper_functions import *
+import argparse
+from menus import draw_start_screen, terminal_size, KEY_ESC, KEY_ENTER, KEY_SPACE
+from profiler import FrameProfiler
+from clock import FixedStepClock
 import os
+import signal
 
-# Global variable to start the game and choose the difficulty
-start_game = True
+# The start screen is drawn before the rest of the game is imported: the modules of the game need NumPy,
+# which takes longer to import than everything else the game does before its first frame. The modules of
+# the options (--spectate, --capture, --autopilot, --backend ansi) are only imported when they are used,
+# the terminal of the ANSI backend (ansi_terminal.py) doesn't need NumPy either.
+
+# Global variable for the difficulty
 difficulty = 1
-total_height, total_width= 30, 150 # Height and width of the screen.
+total_height, total_width= 30, 150 # Height and width of the screen, taken from the terminal when the game starts.
+
+# Screens of the game. main() switches between them without leaving curses.
+MENU = 'menu' # Start screen, choose the difficulty
+PLAYING = 'playing'
+PAUSED = 'paused'
+CRASHED = 'crashed'
+
+# Options from the command line
+next_seed = None # Seed of the next game (random if None)
+record_dir = None # Directory to save a replay of every game to
+replay_file = None # Replay to play instead of reading SPACE from the keyboard
+profiler = None # FrameProfiler if --profile is given, None otherwise
+profile_file = None # File the profiler reports are appended to
+render_thread = True # Draw on a writer thread (False: draw on the main thread)
+backend = 'curses' # 'curses' or 'ansi' (escape sequences written directly, see ansi_terminal.py and ansi_backend.py)
+spectators = None # SpectatorServer if --spectate is given, every drawn frame is streamed to it
+capture = None # SessionRecorder if --capture is given, every drawn frame is saved
+autopilot = None # Autopilot if --autopilot is given, it flies the penguin instead of the keyboard
+
+display = None # RenderThread of the running game
+
+
+def save_replay(replay, state):
+    """ Saves the replay of a finished game to record_dir. """
+    replay.finish(state)
+    os.makedirs(record_dir, exist_ok=True)
+    replay.save(os.path.join(record_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{state.seed}.replay"))
+
+
+def write_profile(*args):
+    """ Appends the current profiler report to profile_file (also used as the SIGUSR1 handler). """
+    with open(profile_file, 'a') as f:
+        print(time.strftime('%Y-%m-%d %H:%M:%S'), file=f)
+        print(profiler.report(), file=f)
+        if display is not None:
+            print(f"frames presented: {display.presented}, dropped: {display.dropped}", file=f)
+        print(file=f)
+
+
+def publish(frame):
+    """ Hands a drawn frame to the spectators and the session capture. """
+    if spectators:
+        spectators.publish(frame)
+    if capture:
+        capture.record(frame)
+
+
+def seed_argument(text):
+    """ Parses the --seed option. Replays store the seed as an unsigned number, so it can't be negative. """
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, not {text!r}")
+    if seed < 0:
+        raise argparse.ArgumentTypeError(f"the seed must not be negative, not {seed}")
+    return seed
+
+
+def new_game(state, player):
+    """ Starts the next game. The game of the previous round is reset in place if it has the same size,
+    so restarting does not allocate anything.
+    Args:
+        state (GameState): The previous game, or None.
+        player (ReplayPlayer): The replay to play, or None to play with the keyboard.
+    Returns:
+        GameState: The new game.
+    """
+    global next_seed
+    from engine import GameState
+    if player is not None:
+        return player.new_game()
+    if state is None or (state.height, state.width) != (total_height, total_width):
+        state = GameState(difficulty, total_height, total_width, next_seed)
+    else:
+        state.set_difficulty(difficulty)
+        state.reset(next_seed)
+    next_seed = None # Only the first game uses the seed from the command line.
+    return state
 
 
 def main(stdscr):
-    curses.curs_set(0)
+    global display
     stdscr.nodelay(True)  # This allows getch() to be non-blocking
+    if backend != 'ansi':
+        curses.curs_set(0)
+    if replay_file is None:
+        draw_start_screen(stdscr, *terminal_size(stdscr)) # First frame, before NumPy is loaded
+    from renderer import Renderer, RenderThread
+    # Frames are drawn by a writer thread that only redraws the cells that changed since the last frame.
+    if backend == 'ansi':
+        from ansi_backend import AnsiRenderer
+        renderer = AnsiRenderer(stdscr)
+    else:
+        renderer = Renderer(stdscr)
+    display = RenderThread(renderer, threaded=render_thread, on_frame=publish if spectators or capture else None)
+    try:
+        game_loop(stdscr)
+    finally:
+        display.close()
+
+
+def game_loop(stdscr):
+    """ Runs the start screen and the games until the player quits. """
+    global difficulty, total_height, total_width, replay_file # Use the global variables
+    from helper_functions import get_screen_templates
+    from engine import step, compose_frame, FLAP, NOOP, EVENT_CRASH
+    from replay import Replay, ReplayPlayer
+
+    # The game fills the terminal. Start, pause and crash screens, only built once per screen size.
+    total_height, total_width = terminal_size(stdscr)
+    screens = get_screen_templates(total_height, total_width)
+    resized = False # Set when curses reports that the terminal was resized
+
+    # The game itself (walls, penguin, collision, score) runs in the engine, this loop handles input, drawing and timing.
+    state = None # The current game, reused for every following game
+    recording = None # Seed and inputs of the current game, if record_dir is set
+    clock = None # Simulation ticks run at the rate of the difficulty, independent of how long drawing takes.
+
+    # Play a replay instead of reading SPACE from the keyboard (only once, restarts are normal games).
+    player = None
+    if replay_file is not None:
+        player = ReplayPlayer(Replay.load(replay_file))
+        replay_file = None
+        mode = PLAYING
+    else:
+        mode = MENU
+        display.adopt(screens.start) # main() has drawn it already
+        display.draw(screens.start)
+
+    # A new game starts whenever the mode becomes PLAYING without a game running.
+    running = False
 
-    global start_game, difficulty, total_height, total_width # Use the global variables
-
-    # Create a 2D NumPy array for the screen filled with spaces.
-    screen_array = np.full((total_height, total_width), ' ', dtype=str)
-
-    # Create penquin array
-    penguin = Penguin() # Create a penguin object.
-    mask = penguin._wings_up_art != ' '  # Mask for non-space entries
-
-    # Draw initial border.
-    screen_array[0, :] = '#'
-    screen_array[total_height-1, :] = '#'
-    screen_array[:, 0] = '#'
-    screen_array[:, total_width-1] = '#'
-
-    # Variables for the walls
-    timesteps = 0 # Number of timesteps since the start of the game
-    wallwidth = 8 # width of the wall
-    wall_distance = 40 + wallwidth # horizontal distance between consecutive walls
-    opening_height = 12 # height of the opening in the wall
-    offset = 6 # maximum vertical offset of the center points of consecutive walls
-    last_center = total_height//2 # initial center point of the opening
-    start_draw_wall = False # flag to start drawing a new wall
-    draw_wall_width = 0 # width of the wall being drawn
-    current_wall = None # current wall object
-
-    # Current score
-    score = 0
-
-    # Pause flag
-    paused = False
-
-    # fps
-    fps = 30
-
-    # gravity
-    g = 5*9.81
-
-    # impulse
-    imp = 20
-
-    # Initialization of the starting position of the penguin
-    y_start=7
-    y_end=13
-    x_start=14
-    x_end=26
-
-    # mastcount for score
-    mastcount=0
-
-    # setup height tracking
-    # going to track the upper left corner of the penguin
-    y = y_start
-    y_p = 0
-
-    if start_game:
-        # Create the start screen and wait for the user to choose a difficulty.
-        start_game = False # Don't show the start screen again.
-        start_screen = create_start_screen(total_height, total_width)
-        stdscr.clear() # Clear the terminal
-
-        # Render the start screen.
-        for row in range(total_height):
-            for col in range(total_width):
-                stdscr.addch(row, col, start_screen[row, col])
-        stdscr.refresh()
-
-        # Wait for the user to choose a difficulty.
-        while True:
-            key = stdscr.getch()
-            if key == 49:
-                difficulty = 1
-                break
-            elif key == 50:
-                difficulty = 2
-                break
-            elif key == 51:
-                difficulty = 3
-                break
-            elif key == 27:
-                curses.endwin() # reset the terminal
-                return # exit main() function
-            
-    # Set the difficulty based on the user's choice.
-    if difficulty == 1:
-        fps = 30
-        opening_height = 12
-    elif difficulty == 2:
-        fps = 40
-        opening_height = 10
-    elif difficulty == 3:
-        fps = 50
-        opening_height = 10
-        wall_distance = 30 + wallwidth
-
-
-    # Main game loop
     while True:
+        if resized:
+            # Reallocate the screens once for the new size. A running game keeps its size until it ends,
+            # it is clipped if it doesn't fit anymore, the next game gets the new size.
+            resized = False
+            display.resize()
+            total_height, total_width = terminal_size(stdscr)
+            screens = get_screen_templates(total_height, total_width)
+            if mode == MENU:
+                display.draw(screens.start)
+            elif mode == PAUSED:
+                display.draw(screens.pause_screen(state.score))
+            elif mode == CRASHED:
+                display.draw(screens.crash_screen(state.score))
+
+        if mode == MENU:
+            # Wait for the user to choose a difficulty.
+            key = display.getch()
+            if key == curses.KEY_RESIZE:
+                resized = True # curses turns SIGWINCH into this key
+            elif key in (49, 50, 51):
+                difficulty = key - 48 # 1 - Easy, 2 - Medium, 3 - Hard
+                mode = PLAYING
+            elif key == KEY_ESC:
+                return # exit main() function
+            continue
 
-        # track time
-        start_time = time.time()
-        
-        # Track the pressed keys
-        key = stdscr.getch()
+        if mode == PAUSED:
+            # Wait for the user to take action.
+            key = display.getch()
+            if key == curses.KEY_RESIZE:
+                resized = True
+            elif key == KEY_ESC:
+                if recording is not None:
+                    save_replay(recording, state)
+                player = None # Quitting a replay ends it, the next game is a normal game.
+                running = False
+                difficulty = 1
+                mode = MENU
+                display.draw(screens.start)
+            elif key == KEY_ENTER:
+                mode = PLAYING # resume the game
+                clock.reset() # Don't catch up on the time spent in the pause screen.
+            continue
+
+        if mode == CRASHED:
+            # Wait for the user to take action.
+            key = display.getch()
+            if key == curses.KEY_RESIZE:
+                resized = True
+            elif key == KEY_ESC:
+                difficulty = 1
+                mode = MENU
+                display.draw(screens.start)
+            elif key == KEY_ENTER:
+                mode = PLAYING # play again with the same difficulty
+            continue
+
+        if not running:
+            # Start a new game (PLAYING after the menu or the crash screen).
+            state = new_game(state, player)
+            # Record the seed and the inputs of the game.
+            recording = Replay(state.seed, state.difficulty, state.height, state.width) if record_dir and player is None else None
+            clock = FixedStepClock(state.fps)
+            running = True
+
+        # One frame of the game
+        if profiler:
+            profiler.start_frame()
+
+        # Read the keys pressed since the last frame, until ESC or no key is left.
+        flap = False
+        key = display.getch()
+        while key != -1 and key != KEY_ESC:
+            if key == KEY_SPACE:
+                flap = True
+            elif key == curses.KEY_RESIZE:
+                resized = True
+            key = display.getch()
+        if profiler:
+            profiler.mark('input')
 
         # Check if the key is ESC -> Pause Screen
-        if key == 27:
-            paused = True
-            pause_screen = create_pause_screen(total_height, total_width, score)
-            stdscr.clear() # Clear the terminal
-
+        if key == KEY_ESC:
+            mode = PAUSED
             # Render the pause screen.
-            for row in range(total_height):
-                for col in range(total_width):
-                    stdscr.addch(row, col, pause_screen[row, col])
-            stdscr.refresh()
-
-            # Wait for the user to take action.
-            while paused:
-                key = stdscr.getch()
-                if key == 27:
-                    curses.endwin() # reset the terminal
-                    start_game = True
-                    difficulty = 1
-                    return curses.wrapper(main)          
-                elif key == 10:
-                    paused = False # resume the game
-        
-        # Shift the interior (non-border) left by one column.
-        # Columns 1 to total_width-2 are the interior.
-        screen_array[1:total_height-1, 1:total_width-2] = screen_array[1:total_height-1, 2:total_width-1]
-        # Clear the new rightmost interior column.
-        screen_array[1:total_height-1, total_width-2] = ' '
-
-        # Every wall_distance steps, add a new wall in the new rightmost interior column.
-        if timesteps % wall_distance == 0:
-            start_draw_wall = True
-            current_wall = Wall(total_height-2, wallwidth, opening_height, offset, last_center) # Create a new wall object.
-            last_center = current_wall.opening_position # Update the last center point.
-            
-        # Draw the wall in the new rightmost interior column.
-        if start_draw_wall:
-            draw_wall_width += 1
-            if draw_wall_width <= wallwidth:
-                wall_piece = draw_wall(total_height, wallwidth, opening_height, last_center, draw_wall_width)
-
-                # Add the wall piece to the screen array.
-                for i in range(1, total_height-1):
-                    screen_array[i, total_width-2] = wall_piece[i-1]
+            display.draw(screens.pause_screen(state.score))
+            continue
+        if resized:
+            continue # Adopt the new size before drawing the next frame.
+
+        # Advance the game by all ticks that are due. If spacebar was pressed the penguin jumps in the first one.
+        ticks = clock.ticks_due()
+        events = 0
+        for _ in range(ticks):
+            if player is not None:
+                action = player.action(state.timesteps)
+            elif autopilot is not None:
+                action = autopilot.action(state)
             else:
-                draw_wall_width = 0
-                start_draw_wall = False
-
-        # if spacebar is active the penguin jumps
-        if key == 32:
-            # if spacebar is pressed, velocity is set to -imp
-            y_p = - imp
-        else:
-            # if spacebar is not pressed, velocity decreases by the gravitational force
-            y_p = y_p + g * (1/fps)
-
-        # update the position of the penguin
-        y = y + (y_p * (1/fps))
-
-        # check if the penguin is out of the screen
-        if y < 0:
-            y = 0
-            y_p = 0
-        elif y > total_height-7:
-            y = total_height-7
-            y_p = 0
-
-        # update the position of the penguin
-        y_start = round(y)
-        y_end = y_start+6
-
-        # Update the screen array with the penguin's new position.
-        screen_array_pengu = screen_array.copy()
-
-        # Update the screen array with the penguin's new position.
-        # mask added to only update the penguins ascii art and not the empty spaces
-        screen_array_pengu[y_start:y_end, x_start:x_end][mask] = penguin.fly()[mask]
-
-        # Check for collision between the penguin and the wall.
-        collided = check_collision(screen_array[y_start:y_end, x_start:x_end], screen_array_pengu[y_start:y_end, x_start:x_end])
-
-        # method for counting the score
-        if '_' in screen_array[:, x_end]:
-            mastcount+=1
-        else:
-            mastcount=0
-        if mastcount == wallwidth//2:
-            score+=1
-
-        # Show score in the top left corner
-        score_array = get_score_array(score)
-        screen_array_pengu[1, 2:2+len(score_array)] = score_array
-
-        # Reapply border (overwrite any changes in the border area).
-        screen_array_pengu[0, :] = '#'
-        screen_array_pengu[total_height-1, :] = '#'
-        screen_array_pengu[:, 0] = '#'
-        screen_array_pengu[:, total_width-1] = '#'
-
-        # Render the array.
-        stdscr.clear()
-        for row in range(total_height):
-            for col in range(total_width):
-                stdscr.addch(row, col, screen_array_pengu[row, col])
-        stdscr.refresh()
-
-        # Check if the penguin collided with the wall.
-        if(collided==True):
-            paused = True
-            pause_screen = create_crash_screen(total_height, total_width, score)
-            stdscr.clear()
-
+                action = FLAP if flap else NOOP
+                flap = False
+            if recording is not None:
+                recording.record(state.timesteps, action)
+            state, tick_events = step(state, action)
+            events |= tick_events
+            if state.crashed or (player is not None and player.finished(state.timesteps)):
+                break
+        if profiler:
+            profiler.mark('physics')
+
+        # Compose the frame into a free buffer and hand it to the writer thread.
+        if ticks:
+            compose_frame(state, display.acquire((state.height, state.width)))
+            if profiler:
+                profiler.mark('compose')
+            display.present()
+            if profiler:
+                profiler.mark('render')
+
+        # Check if the penguin collided with the wall (or the replay is over).
+        if events & EVENT_CRASH or (player is not None and player.finished(state.timesteps)):
+            if recording is not None:
+                save_replay(recording, state)
+            player = None # Restarts after a replay are normal games.
+            running = False
+            mode = CRASHED
             # Render the crash screen.
-            for row in range(total_height):
-                for col in range(total_width):
-                    stdscr.addch(row, col, pause_screen[row, col])
-            stdscr.refresh()
+            display.draw(screens.crash_screen(state.score))
+            continue
+
+        # Sleep until the next tick is due.
+        late = clock.wait()
+        if profiler:
+            profiler.add('sleep_overshoot', round(late * 1e9))
+            profiler.end_frame(state.difficulty, round(1e9/state.fps))
 
-            # Wait for the user to take action.
-            while paused:
-                key = stdscr.getch()
-                if key == 27:
-                    curses.endwin() # reset the terminal
-                    start_game = True
-                    difficulty = 1
-                    return curses.wrapper(main)          
-                elif key == 10:
-                    curses.endwin() # reset the terminal
-                    return curses.wrapper(main)
-
-        # Calculate the time to sleep to maintain 30 frames per second.
-        elapsed_time = time.time() - start_time
-        timesteps += 1
-        if elapsed_time < 1/fps:
-            time.sleep((1/fps) - elapsed_time)
 
 if __name__ == "__main__":
-    # Set the terminal size
-    os.system(f'mode con cols={total_width} lines={total_height+1}')
-    curses.wrapper(main)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pengu Fly")
+    parser.add_argument('--seed', type=seed_argument, help="seed for the walls of the first game")
+    parser.add_argument('--record', metavar='DIR', help="save a replay of every game to DIR")
+    parser.add_argument('--replay', metavar='FILE', help="play a recorded replay")
+    parser.add_argument('--autopilot', action='store_true', help="let the penguin fly itself (SPACE is ignored)")
+    parser.add_argument('--backend', choices=('curses', 'ansi'), default='curses',
+                        help="draw with curses or with ANSI escape sequences written directly to the terminal (Linux, macOS)")
+    parser.add_argument('--no-render-thread', action='store_true', help="draw the frames on the main thread")
+    parser.add_argument('--spectate', metavar='ADDRESS', help="stream the screen to viewers (python3 spectator.py ADDRESS) on a "
+                                                              "Unix socket (a path) or a local TCP port ([host:]port)")
+    parser.add_argument('--capture', metavar='FILE', help="save every frame that is drawn to FILE (play it with python3 recorder.py FILE)")
+    parser.add_argument('--profile', metavar='FILE', help="time every phase of the frames and append the statistics to FILE "
+                                                          "at exit (and on SIGUSR1)")
+    args = parser.parse_args()
+    next_seed, record_dir, replay_file = args.seed, args.record, args.replay
+    render_thread, backend = not args.no_render_thread, args.backend
+    if args.profile:
+        profiler, profile_file = FrameProfiler(), args.profile
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, write_profile)
+    if args.autopilot:
+        from autopilot import Autopilot
+        autopilot = Autopilot()
+    if args.spectate:
+        from spectator import SpectatorServer
+        spectators = SpectatorServer(args.spectate)
+    if args.capture:
+        from recorder import SessionRecorder
+        capture = SessionRecorder(args.capture)
+
+    # The Windows console doesn't start with a useful size, set it (other terminals keep the size the user chose).
+    if os.name == 'nt':
+        os.system(f'mode con cols={total_width} lines={total_height+1}')
+    if backend == 'ansi':
+        from ansi_terminal import AnsiTerminal
+        with AnsiTerminal() as terminal:
+            main(terminal)
+    else:
+        curses.wrapper(main)
+    if spectators:
+        spectators.close()
+    if capture:
+        capture.close()
+    if profiler:
+        write_profile()
+        print(profiler.report())
@@ -1,5 +1,15 @@
+import os
+import subprocess
 import numpy as np
 import math
+import functools
+from menus import start_screen_rows
+
+# Screen buffers hold one ASCII byte per cell (dtype=np.uint8).
+SPACE = ord(' ')
+BORDER = ord('#')
+WALL = ord('|')
+MAST = ord('_')
 
 # debug function to print to file
 def print2file(output_string):
@@ -7,8 +17,60 @@ def print2file(output_string):
         print(output_string, file=f)
 
 
+def git_commit():
+    """ Returns the commit of the working tree (recorded in the result files of the benchmarks and the
+    tournament), or None outside of git.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def text_array(text):
+    """ Converts an ASCII string into a 1D uint8 array.
+    Args:
+        text (str): The text to convert.
+    Returns:
+        np.ndarray: A read-only 1D array with one byte per character.
+    """
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+
+
+# Kinds of wall slices: the outer edges ('|' with an opening), the inside ('_' at the opening) and empty.
+WALL_EDGE = 0
+WALL_INSIDE = 1
+WALL_EMPTY = 2
+
+
+@functools.lru_cache(maxsize=512)
+def get_wall_stamp(height, opening_height, opening_position, kind):
+    """ Returns the cached vertical slice of a wall. There are only a few distinct slices per
+    difficulty, so each one is built once. Use get_wall_stamp.cache_info() for the hit/miss counters.
+    Args:
+        height (int): The total height of the screen.
+        opening_height (int): The height of the opening in the wall.
+        opening_position (int): The vertical center position of the opening.
+        kind (int): WALL_EDGE, WALL_INSIDE or WALL_EMPTY.
+    Returns:
+        np.ndarray: A read-only 1D array representing the vertical slice of the wall.
+    """
+    if kind == WALL_EDGE:
+        wall_piece = np.full((height-2), WALL, dtype=np.uint8)
+        wall_piece[opening_position - math.ceil(opening_height/2):opening_position + math.ceil(opening_height/2)] = SPACE
+    elif kind == WALL_INSIDE:
+        wall_piece = np.full((height-2), SPACE, dtype=np.uint8)
+        wall_piece[opening_position + math.ceil(opening_height/2)-1] = MAST
+        wall_piece[opening_position - math.ceil(opening_height/2)-1] = MAST
+    else:
+        wall_piece = np.full((height), SPACE, dtype=np.uint8)
+    wall_piece.setflags(write=False) # The same array is handed out on every hit
+    return wall_piece
+
+
 def draw_wall(height, wallwidth, opening_height, opening_position, current_wall_piece):
-    """ Creates a single vertical slice of a wall with an opening.
+    """ Returns a single vertical slice of a wall with an opening.
     Args:
         height (int): The total height of the wall.
         wallwidth (int): The width of the wall (number of slices).
@@ -16,31 +78,28 @@ def draw_wall(height, wallwidth, opening_height, opening_position, current_wall_
         opening_position (int): The vertical center position of the opening.
         current_wall_piece (int): The current slice of the wall being drawn (1 to wallwidth).
     Returns:
-        np.ndarray: A 1D array representing the vertical slice of the wall.
+        np.ndarray: A read-only 1D array representing the vertical slice of the wall (see get_wall_stamp).
     """
     if current_wall_piece == 1 or current_wall_piece == wallwidth:
-        wall_piece = np.full((height-2), '|', dtype=str)
-        wall_piece[opening_position - math.ceil(opening_height/2):opening_position + math.ceil(opening_height/2)] = ' '
-        return wall_piece
+        kind = WALL_EDGE
     elif current_wall_piece > 1 and current_wall_piece < wallwidth:
-        wall_piece = np.full((height-2), ' ', dtype=str)
-        wall_piece[opening_position + math.ceil(opening_height/2)-1] = '_'
-        wall_piece[opening_position - math.ceil(opening_height/2)-1] = '_'
-        return wall_piece
+        kind = WALL_INSIDE
     else:
-        return np.full((height), ' ', dtype=str)
+        kind = WALL_EMPTY
+    return get_wall_stamp(height, opening_height, opening_position, kind)
     
+@functools.lru_cache(maxsize=8)
 def get_score_array(score):
-    """ Creates a NumPy array representing the current score.
+    """ Creates a NumPy array representing the current score. The text is only built when the score changes.
     Args:
-        score (_type_): The current score of the player.
+        score (int): The current score of the player.
     Returns:
-        _type_: A NumPy array representing the current score.
+        np.ndarray: A read-only NumPy array representing the current score.
     """
     str_score = "Score: " + str(score)
-    score_array = np.array(list(str_score))
+    score_array = text_array(str_score)
     return score_array
-        
+
 def check_collision(screen_array, penguin_art):
     """ Checks for a collision between the penguin and the wall.
     Args:
@@ -50,11 +109,7 @@ def check_collision(screen_array, penguin_art):
         bool: True if a collision is detected, False otherwise.
     """
     # Only check wall characters ('|') against non-space penguin characters
-    for r in range(penguin_art.shape[0]):
-        for c in range(penguin_art.shape[1]):
-            if screen_array[r, c] == '|' and penguin_art[r, c] != ' ':
-                return True
-    return False
+    return bool(np.any((screen_array == WALL) & (penguin_art != SPACE)))
 
 def create_start_screen(height, width):
     """ Creates the start screen with options to choose the difficulty.
@@ -62,25 +117,9 @@ def create_start_screen(height, width):
         height (int): The height of the screen.
         width (int): The width of the screen.
     Returns:
-        np.ndarray: A 2D array representing the pause screen.
+        np.ndarray: A 2D array representing the start screen (the same text menus.py draws at startup).
     """
-    center_width = width // 2
-    center_height = height // 2
-    start_screen = np.full((height, width), ' ', dtype=str)
-
-    str_name = "Pengu Fly"
-    str_press = "Choose the difficulty by pressing the number:"
-    str_easy = "1 - Easy"
-    str_medium = "2 - Medium"
-    str_hard = "3 - Hard"
-    str_esc = "Press ESC to quit the game"
-    start_screen[center_height - 5, center_width - math.floor(len(str_name)/2):center_width + math.ceil(len(str_name)/2)] = list(str_name)
-    start_screen[center_height - 2, center_width - math.floor(len(str_press)/2):center_width + math.ceil(len(str_press)/2)] = list(str_press)
-    start_screen[center_height, center_width - math.floor(len(str_easy)/2):center_width + math.ceil(len(str_easy)/2)] = list(str_easy)
-    start_screen[center_height + 1, center_width - math.floor(len(str_medium)/2):center_width + math.ceil(len(str_medium)/2)] = list(str_medium)
-    start_screen[center_height + 2, center_width - math.floor(len(str_hard)/2):center_width + math.ceil(len(str_hard)/2)] = list(str_hard)
-    start_screen[center_height + 3, center_width - math.floor(len(str_esc)/2):center_width + math.ceil(len(str_esc)/2)] = list(str_esc)
-    return start_screen
+    return np.frombuffer(b''.join(start_screen_rows(height, width)), dtype=np.uint8).reshape(height, width).copy()
 
 
 def create_pause_screen(height, width, score):
@@ -94,14 +133,14 @@ def create_pause_screen(height, width, score):
     """
     center_width = width // 2
     center_height = height // 2
-    pause_screen = np.full((height, width), ' ', dtype=str)
+    pause_screen = np.full((height, width), SPACE, dtype=np.uint8)
 
     str_paused = "GAME PAUSED"
     str_press = "Press Enter to resume or ESC to quit"
     str_score = f"Score: {score}"
-    pause_screen[center_height - 3, center_width - math.floor(len(str_paused)/2):center_width + math.ceil(len(str_paused)/2)] = list(str_paused)
-    pause_screen[center_height, center_width - math.floor(len(str_press)/2):center_width + math.ceil(len(str_press)/2)] = list(str_press)
-    pause_screen[center_height + 2, center_width - math.floor(len(str_score)/2):center_width + math.ceil(len(str_score)/2)] = list(str_score)
+    pause_screen[center_height - 3, center_width - math.floor(len(str_paused)/2):center_width + math.ceil(len(str_paused)/2)] = text_array(str_paused)
+    pause_screen[center_height, center_width - math.floor(len(str_press)/2):center_width + math.ceil(len(str_press)/2)] = text_array(str_press)
+    pause_screen[center_height + 2, center_width - math.floor(len(str_score)/2):center_width + math.ceil(len(str_score)/2)] = text_array(str_score)
     return pause_screen
 
 def create_crash_screen(height, width, score):
@@ -115,12 +154,63 @@ def create_crash_screen(height, width, score):
     """
     center_width = width // 2
     center_height = height // 2
-    pause_screen = np.full((height, width), ' ', dtype=str)
+    pause_screen = np.full((height, width), SPACE, dtype=np.uint8)
 
     str_paused = "GAME OVER"
     str_press = "Press Enter to start again or ESC to quit"
     str_score = f"Score: {score}"
-    pause_screen[center_height - 3, center_width - math.floor(len(str_paused)/2):center_width + math.ceil(len(str_paused)/2)] = list(str_paused)
-    pause_screen[center_height, center_width - math.floor(len(str_press)/2):center_width + math.ceil(len(str_press)/2)] = list(str_press)
-    pause_screen[center_height + 2, center_width - math.floor(len(str_score)/2):center_width + math.ceil(len(str_score)/2)] = list(str_score)
+    pause_screen[center_height - 3, center_width - math.floor(len(str_paused)/2):center_width + math.ceil(len(str_paused)/2)] = text_array(str_paused)
+    pause_screen[center_height, center_width - math.floor(len(str_press)/2):center_width + math.ceil(len(str_press)/2)] = text_array(str_press)
+    pause_screen[center_height + 2, center_width - math.floor(len(str_score)/2):center_width + math.ceil(len(str_score)/2)] = text_array(str_score)
     return pause_screen
+
+
+class ScreenTemplates:
+    """ The start, pause and crash screens for one screen size, built once and reused.
+    The screens are read-only, only the score line of the pause and crash screen is patched in place.
+    """
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.start = create_start_screen(height, width)
+        self.pause = create_pause_screen(height, width, 0)
+        self.crash = create_crash_screen(height, width, 0)
+        for screen in (self.start, self.pause, self.crash):
+            screen.setflags(write=False)
+        self._scores = {id(self.pause): 0, id(self.crash): 0} # Score currently written into each screen
+
+    def _patch_score(self, screen, score):
+        """ Rewrites the score line of the pause or crash screen if the score changed. """
+        if self._scores[id(screen)] == score:
+            return screen
+        self._scores[id(screen)] = score
+
+        str_score = f"Score: {score}"
+        center_width = self.width // 2
+        screen.setflags(write=True)
+        score_row = screen[self.height // 2 + 2]
+        score_row[:] = SPACE
+        score_row[center_width - math.floor(len(str_score)/2):center_width + math.ceil(len(str_score)/2)] = text_array(str_score)
+        screen.setflags(write=False)
+        return screen
+
+    def pause_screen(self, score):
+        """ Returns the pause screen showing the given score. """
+        return self._patch_score(self.pause, score)
+
+    def crash_screen(self, score):
+        """ Returns the crash screen showing the given score. """
+        return self._patch_score(self.crash, score)
+
+
+@functools.lru_cache(maxsize=4)
+def get_screen_templates(height, width):
+    """ Returns the ScreenTemplates for a screen size, building them on first use.
+    Args:
+        height (int): The height of the screen.
+        width (int): The width of the screen.
+    Returns:
+        ScreenTemplates: The cached menu screens.
+    """
+    return ScreenTemplates(height, width)
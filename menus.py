@@ -0,0 +1,67 @@
+import functools
+
+MIN_HEIGHT, MIN_WIDTH = 20, 60 # Smallest screen the game is built for, smaller terminals show a clipped screen.
+
+# Keys (as returned by getch())
+KEY_ESC = 27
+KEY_ENTER = 10
+KEY_SPACE = 32
+
+# Lines of the start screen: (row relative to the middle of the screen, text). The text is centered.
+START_LINES = (
+    (-5, "Pengu Fly"),
+    (-2, "Choose the difficulty by pressing the number:"),
+    (0, "1 - Easy"),
+    (1, "2 - Medium"),
+    (2, "3 - Hard"),
+    (3, "Press ESC to quit the game"),
+)
+
+
+@functools.lru_cache(maxsize=4)
+def start_screen_rows(height, width):
+    """ Returns the start screen as ASCII bytes, one bytes object per row. This module doesn't need NumPy
+    (nor curses), so the start screen can be drawn before the rest of the game is imported.
+    Args:
+        height (int): The height of the screen.
+        width (int): The width of the screen.
+    Returns:
+        tuple: height bytes objects of width characters each.
+    """
+    rows = [b' ' * width] * height
+    for row, text in START_LINES:
+        left = width // 2 - len(text) // 2
+        rows[height // 2 + row] = (b' ' * left + text.encode('ascii')).ljust(width)[:width]
+    return tuple(rows)
+
+
+def draw_start_screen(stdscr, height, width):
+    """ Draws the start screen to a curses window with one addstr per row and a single refresh, the part
+    that doesn't fit on the terminal is clipped.
+    Args:
+        stdscr: The curses window.
+        height (int): The height of the screen.
+        width (int): The width of the screen.
+    """
+    import curses # Only here: the engine uses this module through helper_functions and must not need curses.
+    lines, columns = stdscr.getmaxyx()
+    stdscr.clear()
+    for row, text in enumerate(start_screen_rows(height, width)[:lines]):
+        try:
+            stdscr.addstr(row, 0, text[:columns])
+        except curses.error:
+            # Writing the bottom right cell moves the cursor off the screen, the characters are still drawn.
+            if row != lines - 1:
+                raise
+    stdscr.refresh()
+
+
+def terminal_size(stdscr):
+    """ Returns the size of the screen for a terminal window.
+    Args:
+        stdscr: The curses window.
+    Returns:
+        tuple: (height, width), the size of the terminal but at least MIN_HEIGHT x MIN_WIDTH.
+    """
+    height, width = stdscr.getmaxyx()
+    return max(height, MIN_HEIGHT), max(width, MIN_WIDTH)
@@ -1,22 +1,75 @@
 import numpy as np
+from helper_functions import SPACE
+
+
+class Sprite:
+    """ One animation frame of the penguin, prepared for drawing and collision.
+
+    Only the visible cells (everything but spaces) belong to the penguin: they are drawn over the
+    play field and they are the cells that can hit a wall. Every frame has its own mask, so the
+    silhouette is right for both wing positions.
+    """
+
+    def __init__(self, art):
+        self.art = art
+        self.mask = art != SPACE # Visible cells
+        rows, cols = np.nonzero(self.mask)
+        self.values = art[self.mask] # Characters of the visible cells, row by row
+        self._rows = rows
+        self._cols = cols
+        # Tight bounding box of the visible cells in the art: rows [top, bottom), columns [left, right)
+        self.bbox = (int(rows.min()), int(rows.max()) + 1, int(cols.min()), int(cols.max()) + 1)
+        # Visible cells as runs of columns per row: one tuple of (start, end) ranges per row of the art
+        self.runs = tuple(mask_runs(row) for row in self.mask)
+        self._indices = {} # Flat indices per buffer width
+
+    def indices(self, width):
+        """ Returns the positions of the visible cells in a flattened (C order) buffer, relative to the
+        cell of the top left corner of the art. Computed once per buffer width.
+        Args:
+            width (int): Width of the buffer.
+        Returns:
+            np.ndarray: The flat indices, in the same order as values.
+        """
+        indices = self._indices.get(width)
+        if indices is None:
+            indices = self._indices[width] = self._rows * width + self._cols
+        return indices
+
+
+def mask_runs(row):
+    """ Returns the runs of True in a 1D boolean array as a tuple of (start, end) ranges, end exclusive. """
+    # The run boundaries are where the padded row changes between False and True.
+    changes = np.flatnonzero(np.diff(np.concatenate(([0], row.astype(np.int8), [0]))))
+    return tuple(zip(changes[0::2].tolist(), changes[1::2].tolist()))
+
 
 class Penguin:
-    def __init__(self):
+    def __init__(self, flap_ticks=10):
         self.height = 6
         self.width = 12
+        self.flap_ticks = flap_ticks # Number of calls to fly() between two wing beats
         # Pre-calculate both art states once
         self._wings_up_art = self.wings_up()
         self._wings_down_art = self.wings_down()
-        self.ascii_art = self._wings_up_art
+        # Sprite atlas: the prepared animation frames, indexed by fly_status
+        self.atlas = (Sprite(self._wings_up_art), Sprite(self._wings_down_art))
+        self.reset()
+
+    def reset(self):
+        """ Starts the animation again with the wings up. """
         self.fly_status = False
         self.timesteps = 0
+        self.sprite = self.atlas[0]
+        self.ascii_art = self.sprite.art
 
     def fly(self):
         self.timesteps += 1
-        if self.timesteps % 10 == 0:
+        if self.timesteps % self.flap_ticks == 0:
             self.fly_status = not self.fly_status
             self.timesteps = 0
-            self.ascii_art = self._wings_down_art if self.fly_status else self._wings_up_art
+            self.sprite = self.atlas[self.fly_status]
+            self.ascii_art = self.sprite.art
         return self.ascii_art
     
     def wings_down(self):
@@ -26,7 +79,7 @@ class Penguin:
                      "  _//  |\_  ",
                      "   ||  |'   ",
                      " _,:(_/_    "]
-        return np.array([list(line) for line in pengu_art])
+        return np.array([list(line.encode('ascii')) for line in pengu_art], dtype=np.uint8)
     
     def wings_up(self):
         pengu_art = ["       __   ",
@@ -35,4 +88,4 @@ class Penguin:
                      "  \,/  |,/  ",
                      "   ||  |'   ",
                      " _,:(_/_    "]
-        return np.array([list(line) for line in pengu_art])
\ No newline at end of file
+        return np.array([list(line.encode('ascii')) for line in pengu_art], dtype=np.uint8)
\ No newline at end of file
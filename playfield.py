@@ -0,0 +1,71 @@
+import numpy as np
+from helper_functions import SPACE, BORDER
+
+
+class PlayField:
+    """ The scrolling part of the screen, stored as a circular buffer of columns.
+
+    Scrolling left by one column only moves the head index and clears one column,
+    instead of copying the whole interior. Columns are addressed with the same
+    x-coordinates as the screen (1 to width-2), rows include the top and bottom border.
+    """
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.columns = width - 2 # Number of scrolling columns (screen columns 1 to width-2)
+        self.head = 0 # Buffer index of the leftmost scrolling column (screen column 1)
+
+        self.buffer = np.full((height, self.columns), SPACE, dtype=np.uint8)
+        self.buffer[0, :] = BORDER
+        self.buffer[height-1, :] = BORDER
+
+    def clear(self):
+        """ Removes everything from the play field (the top and bottom border stay). """
+        self.head = 0
+        self.buffer[1:self.height-1, :] = SPACE
+
+    def _index(self, x):
+        """ Converts a screen column into an index into the buffer. """
+        return (self.head + x - 1) % self.columns
+
+    def scroll(self):
+        """ Shifts the play field left by one column and clears the new rightmost column. """
+        # The column leaving on the left is reused as the new rightmost column.
+        new_column = self.head
+        self.head = (self.head + 1) % self.columns
+        self.buffer[1:self.height-1, new_column] = SPACE
+
+    def column(self, x):
+        """ Returns a writable view of one screen column.
+        Args:
+            x (int): The screen column (1 to width-2).
+        Returns:
+            np.ndarray: A 1D view with one entry per row.
+        """
+        return self.buffer[:, self._index(x)]
+
+    def window(self, y_start, y_end, x_start, x_end):
+        """ Returns the rectangle screen[y_start:y_end, x_start:x_end] of the play field.
+        Args:
+            y_start (int): The first row.
+            y_end (int): The row after the last row.
+            x_start (int): The first screen column (at least 1).
+            x_end (int): The screen column after the last column (at most width-1).
+        Returns:
+            np.ndarray: A view if the rectangle does not wrap around the end of the buffer, otherwise a copy.
+        """
+        start = self._index(x_start)
+        stop = start + (x_end - x_start)
+        if stop <= self.columns:
+            return self.buffer[y_start:y_end, start:stop]
+        return self.buffer[y_start:y_end].take(np.arange(start, stop) % self.columns, axis=1)
+
+    def compose(self, frame):
+        """ Copies the play field into the columns 1 to width-2 of a frame, in screen order.
+        Args:
+            frame (np.ndarray): A 2D array of shape (height, width).
+        """
+        split = self.columns - self.head
+        frame[:, 1:1+split] = self.buffer[:, self.head:]
+        frame[:, 1+split:self.width-1] = self.buffer[:, :self.head]
@@ -0,0 +1,99 @@
+import time
+import bisect
+
+# Phases of a frame in the order they happen in the game loop
+PHASES = ('input', 'physics', 'compose', 'render', 'sleep_overshoot', 'frame')
+
+# Upper edges of the histogram buckets in nanoseconds: 4 buckets per doubling from 1 us to about 4 s.
+BUCKET_EDGES = [round(1000 * 2 ** (i / 4)) for i in range(89)]
+
+
+class Histogram:
+    """ Histogram of durations with fixed, logarithmically spaced buckets (see BUCKET_EDGES). """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1) # The last bucket collects everything above the last edge.
+        self.total = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns):
+        """ Adds one duration in nanoseconds. """
+        self.counts[bisect.bisect_left(BUCKET_EDGES, duration_ns)] += 1
+        self.total += 1
+        self.sum_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, p):
+        """ Returns the upper edge (in ns) of the bucket that contains the p-th percentile (at most the
+        largest duration), or 0 if the histogram is empty. """
+        if self.total == 0:
+            return 0
+        rank = p / 100 * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKET_EDGES[index], self.max_ns) if index < len(BUCKET_EDGES) else self.max_ns
+        return self.max_ns
+
+
+class FrameProfiler:
+    """ Opt-in timing of the phases of every frame with time.perf_counter_ns().
+
+    The game loop calls start_frame(), then mark(phase) at the end of every phase, and end_frame() once
+    the frame is done. When profiling is disabled the game loop holds None instead of a profiler, so
+    the only cost is a check for None.
+    """
+
+    def __init__(self):
+        self.histograms = {phase: Histogram() for phase in PHASES}
+        self.frames = {} # frames per difficulty
+        self.missed = {} # frames per difficulty whose work took longer than the frame budget
+        self._frame_start = 0
+        self._last = 0
+
+    def start_frame(self):
+        """ Starts timing a new frame. """
+        self._frame_start = self._last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        """ Ends a phase: the time since the previous mark (or start_frame) is added to its histogram. """
+        now = time.perf_counter_ns()
+        self.histograms[phase].add(now - self._last)
+        self._last = now
+
+    def add(self, phase, duration_ns):
+        """ Adds a duration that was measured by the caller, e.g. the overshoot of time.sleep(). """
+        self.histograms[phase].add(duration_ns)
+
+    def end_frame(self, difficulty, budget_ns, work_ns=None):
+        """ Finishes a frame.
+        Args:
+            difficulty (int): The difficulty of the game.
+            budget_ns (int): Time available for one frame (1/fps) in nanoseconds.
+            work_ns (int, optional): Time spent before sleeping. Measured up to the last mark if None.
+        """
+        if work_ns is None:
+            work_ns = self._last - self._frame_start
+        self.histograms['frame'].add(time.perf_counter_ns() - self._frame_start)
+        self.frames[difficulty] = self.frames.get(difficulty, 0) + 1
+        if work_ns > budget_ns:
+            self.missed[difficulty] = self.missed.get(difficulty, 0) + 1
+
+    def report(self):
+        """ Returns the statistics as text: p50/p95/p99/max per phase and the missed deadlines per difficulty. """
+        lines = [f"{'phase':16s} {'frames':>8s} {'mean':>10s} {'p50':>10s} {'p95':>10s} {'p99':>10s} {'max':>10s}"]
+        for phase in PHASES:
+            histogram = self.histograms[phase]
+            if histogram.total == 0:
+                continue
+            values = [histogram.sum_ns / histogram.total, histogram.percentile(50), histogram.percentile(95),
+                      histogram.percentile(99), histogram.max_ns]
+            lines.append(f"{phase:16s} {histogram.total:8d} " + " ".join(f"{value / 1e6:8.3f}ms" for value in values))
+        for difficulty in sorted(self.frames):
+            missed = self.missed.get(difficulty, 0)
+            lines.append(f"difficulty {difficulty}: {missed} of {self.frames[difficulty]} frames missed the deadline "
+                         f"({100 * missed / self.frames[difficulty]:.2f}%)")
+        return "\n".join(lines)
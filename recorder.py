@@ -0,0 +1,234 @@
+import mmap
+import time
+import array
+import curses
+import struct
+import argparse
+import numpy as np
+from renderer import Renderer
+from menus import KEY_ESC, KEY_SPACE
+from spectator import HEADER, KEYFRAME, encode_keyframe, encode_delta, apply_message
+
+# Session file layout:
+#   MAGIC, VERSION (uint32)
+#   one message per frame, in the format of the spectator stream (spectator.py): a keyframe every
+#     KEYFRAME_INTERVAL frames and whenever the size changes, a delta against the previous frame otherwise
+#   index: per frame the file offset of its message (uint64), then per frame the number of the keyframe
+#     it starts from (uint32), then per frame its time in seconds since the start (float64)
+#   FOOTER: file offset of the index, number of frames, MAGIC
+# Without the footer (the game was killed) the index is rebuilt by walking the messages.
+MAGIC = b'PGSS'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sI')
+FOOTER = struct.Struct('<QI4s')
+KEYFRAME_INTERVAL = 60 # Frames between two keyframes, seeking applies at most this many deltas
+
+
+class SessionRecorder:
+    """ Records every frame that is drawn into a session file.
+    Frames are delta encoded on the calling thread, the file is written in large buffered blocks.
+    Args:
+        path (str): The file to write.
+        keyframe_interval (int): Frames between two keyframes.
+    """
+
+    def __init__(self, path, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self._file = open(path, 'wb', buffering=1 << 20)
+        self._file.write(PREAMBLE.pack(MAGIC, VERSION))
+        self._offset = PREAMBLE.size # File offset of the next message
+        self._offsets = array.array('Q') # Index, one entry per frame
+        self._keyframes = array.array('I')
+        self._times = array.array('d')
+        self._previous = None # Copy of the last recorded frame
+        self._scratch = None # Reused buffer for changed_runs()
+        self._start = time.perf_counter()
+
+    @property
+    def frames(self):
+        """ Number of recorded frames. """
+        return len(self._offsets)
+
+    def record(self, frame):
+        """ Appends a frame to the recording.
+        Args:
+            frame (np.ndarray): A 2D uint8 array with one ASCII byte per cell.
+        """
+        number = len(self._offsets)
+        previous = self._previous
+        if previous is None or previous.shape != frame.shape or number - self._keyframes[-1] >= self.keyframe_interval:
+            message = encode_keyframe(number, frame)
+            self._keyframes.append(number)
+            if previous is None or previous.shape != frame.shape:
+                previous = self._previous = np.empty_like(frame)
+                self._scratch = np.zeros((frame.shape[0], frame.shape[1] + 2), dtype=bool)
+        else:
+            message = encode_delta(number, previous, frame, self._scratch)
+            self._keyframes.append(self._keyframes[-1])
+        np.copyto(previous, frame)
+        self._offsets.append(self._offset)
+        self._times.append(time.perf_counter() - self._start)
+        self._file.write(message)
+        self._offset += len(message)
+
+    def close(self):
+        """ Writes the index and closes the file. """
+        if self._file.closed:
+            return
+        self._file.write(self._offsets.tobytes())
+        self._file.write(self._keyframes.tobytes())
+        self._file.write(self._times.tobytes())
+        self._file.write(FOOTER.pack(self._offset, len(self._offsets), MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Session:
+    """ A recorded session, memory-mapped. Any frame is found through the index: its keyframe and the
+    deltas after it are applied, or only the deltas after the current frame when playing forward.
+    Args:
+        path (str): The session file.
+    Raises:
+        ValueError: If the file is not a session of a known version.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._map
+        magic, version = PREAMBLE.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a Pengu Fly session")
+        if version != VERSION:
+            raise ValueError(f"unsupported session version {version}")
+
+        index, count, magic = FOOTER.unpack_from(data, len(data) - FOOTER.size) if len(data) >= PREAMBLE.size + FOOTER.size else (0, 0, b'')
+        if magic == MAGIC:
+            self.offsets = np.frombuffer(data, dtype='<u8', count=count, offset=index)
+            self.keyframes = np.frombuffer(data, dtype='<u4', count=count, offset=index + 8 * count)
+            self.times = np.frombuffer(data, dtype='<f8', count=count, offset=index + 12 * count)
+        else:
+            self._rebuild_index()
+        self.frame = None # The current frame
+        self.number = -1 # Its number (-1 -> none yet)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self.offsets = self.keyframes = self.times = None # Release the views into the map first
+        self._map.close()
+
+    def _rebuild_index(self):
+        """ Finds the messages of a file that was not closed. A truncated last message is ignored.
+        The times are only stored in the index, they are assumed to be 1/30 seconds apart.
+        """
+        data = self._map
+        offsets, keyframes = [], []
+        offset = PREAMBLE.size
+        while offset + HEADER.size <= len(data):
+            kind, number, height, width, length = HEADER.unpack_from(data, offset)
+            if offset + HEADER.size + length > len(data):
+                break
+            offsets.append(offset)
+            keyframes.append(len(keyframes) if kind == KEYFRAME else keyframes[-1])
+            offset += HEADER.size + length
+        self.offsets = np.array(offsets, dtype=np.uint64)
+        self.keyframes = np.array(keyframes, dtype=np.uint32)
+        self.times = np.arange(len(offsets)) / 30
+
+    def _apply(self, number):
+        """ Applies the message of a frame to the current frame. """
+        offset = int(self.offsets[number])
+        kind, _, height, width, length = HEADER.unpack_from(self._map, offset)
+        start = offset + HEADER.size
+        self.frame = apply_message(self.frame, kind, height, width, memoryview(self._map)[start:start + length])
+        self.number = number
+
+    def seek(self, number):
+        """ Makes a frame the current frame.
+        Args:
+            number (int): Index of the frame, from 0 to len(self) - 1.
+        Returns:
+            np.ndarray: The frame (the same array is updated by the following calls unless the size changes).
+        """
+        keyframe = int(self.keyframes[number])
+        if not keyframe <= self.number <= number:
+            self._apply(keyframe) # Going back or past the next keyframe: start over from the keyframe.
+        while self.number < number:
+            self._apply(self.number + 1)
+        return self.frame
+
+    def at(self, seconds):
+        """ Returns the number of the frame that was on the screen at a time (seconds since the start). """
+        return max(int(np.searchsorted(self.times, seconds, side='right')) - 1, 0)
+
+
+def play(stdscr, path, speed=1.0, start=0.0):
+    """ Plays a session file in real time.
+    SPACE pauses, LEFT and RIGHT jump 5 seconds, ESC quits.
+    """
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    stdscr.keypad(True)
+    renderer = Renderer(stdscr)
+    session = Session(path)
+    try:
+        if not len(session):
+            return
+        times = session.times
+        number = session.at(start)
+        clock = times[number] # Position in the recording, in seconds
+        last = time.perf_counter()
+        paused = False
+        while True:
+            key = stdscr.getch()
+            if key == KEY_ESC:
+                return
+            elif key == KEY_SPACE:
+                paused = not paused
+            elif key in (curses.KEY_LEFT, curses.KEY_RIGHT):
+                clock = min(max(clock + (5 if key == curses.KEY_RIGHT else -5), 0), times[-1])
+            elif key == curses.KEY_RESIZE:
+                renderer.resize()
+
+            now = time.perf_counter()
+            if not paused:
+                clock += (now - last) * speed
+            last = now
+            number = max(int(np.searchsorted(times, clock, side='right')) - 1, 0)
+            if number != session.number:
+                renderer.draw(session.seek(number))
+            if number == len(session) - 1 and not paused:
+                paused = True # Stay on the last frame until ESC.
+            time.sleep(0.005)
+    finally:
+        session.close()
+
+
+def dump(path, number):
+    """ Prints one frame of a session file as text. """
+    session = Session(path)
+    try:
+        frame = session.seek(number)
+        print('\n'.join(row.tobytes().decode('ascii') for row in frame))
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a Pengu Fly session recorded with --capture")
+    parser.add_argument('file', help="the session file")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed (default: 1.0)")
+    parser.add_argument('--start', type=float, default=0.0, metavar='SECONDS', help="start the playback at this time")
+    parser.add_argument('--dump', type=int, metavar='FRAME', help="print a frame as text instead of playing the session")
+    args = parser.parse_args()
+    if args.dump is not None:
+        dump(args.file, args.dump)
+    else:
+        curses.wrapper(play, args.file, args.speed, args.start)
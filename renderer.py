@@ -0,0 +1,253 @@
+import queue
+import curses
+import threading
+import numpy as np
+
+
+def changed_runs(previous, frame, scratch=None):
+    """ Finds the horizontal runs of cells that differ between two frames.
+    Args:
+        previous (np.ndarray): The 2D array that is currently on the screen.
+        frame (np.ndarray): The 2D array that should be on the screen.
+        scratch (np.ndarray, optional): A zeroed boolean array of shape (height, width+2) that is reused between calls.
+    Returns:
+        tuple: Three 1D arrays (rows, starts, ends), one entry per run. Each run covers frame[row, start:end].
+    """
+    height, width = frame.shape
+    if scratch is None:
+        scratch = np.zeros((height, width + 2), dtype=bool)
+
+    # The first and last column of scratch stay False, so every run has a rising and a falling edge in its row.
+    np.not_equal(previous, frame, out=scratch[:, 1:width+1])
+    edges = np.diff(scratch.view(np.int8), axis=1)
+    rows, cols = np.nonzero(edges)
+
+    # np.nonzero walks row by row, so the edges alternate start, end, start, end, ...
+    return rows[0::2], cols[0::2], cols[1::2]
+
+
+class Renderer:
+    """ Draws frames to a curses window, only sending the cells that changed since the last frame.
+    Frames that are larger than the terminal are clipped to it.
+    """
+
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        self.height, self.width = stdscr.getmaxyx() # Size of the terminal
+        self._previous = None # Frame that is currently on the terminal (None -> terminal is invalid)
+        self._scratch = None # Reused buffer for changed_runs()
+
+    def resize(self):
+        """ Reads the size of the terminal again after it was resized and redraws everything on the next draw(). """
+        self.height, self.width = self.stdscr.getmaxyx()
+        self.invalidate()
+
+    def invalidate(self):
+        """ Forces a full redraw on the next call to draw(), e.g. after the terminal was resized or cleared. """
+        self._previous = None
+
+    def adopt(self, frame):
+        """ Takes a frame that was drawn without the renderer (the start screen at startup) as the content
+        of the terminal, so the next draw() only sends what differs from it.
+        """
+        frame = frame[:self.height, :self.width]
+        self._previous = frame.copy()
+        self._scratch = np.zeros((frame.shape[0], frame.shape[1] + 2), dtype=bool)
+
+    def _runs(self, frame):
+        """ Clips a frame to the terminal and finds the runs of cells to send. If the content of the terminal
+        is unknown (first frame, after invalidate() or a change of size) every row is one run.
+        Args:
+            frame (np.ndarray): A 2D uint8 array with one ASCII byte per cell.
+        Returns:
+            tuple: (frame, rows, starts, ends, full) with the clipped frame, the runs as in changed_runs()
+                and True if the terminal has to be cleared first.
+        """
+        frame = frame[:self.height, :self.width] # Only the part that fits on the terminal
+        height, width = frame.shape
+        if self._previous is None or self._previous.shape != frame.shape:
+            self._previous = np.empty_like(frame)
+            self._scratch = np.zeros((height, width + 2), dtype=bool)
+            return frame, np.arange(height), np.zeros(height, dtype=int), np.full(height, width), True
+        rows, starts, ends = changed_runs(self._previous, frame, self._scratch)
+        return frame, rows, starts, ends, False
+
+    def draw(self, frame):
+        """ Draws a frame, only emitting one addstr per changed run per row.
+        Args:
+            frame (np.ndarray): A 2D uint8 array with one ASCII byte per cell.
+        """
+        frame, rows, starts, ends, full = self._runs(frame)
+        if full:
+            self.stdscr.clear() # Terminal content is unknown: clear it once and draw every row.
+
+        for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+            try:
+                self.stdscr.addstr(row, start, frame[row, start:end].tobytes())
+            except curses.error:
+                # Writing the bottom right cell moves the cursor off the screen, the characters are still drawn.
+                if row != self.height - 1 or end != self.width:
+                    raise
+
+        np.copyto(self._previous, frame)
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+
+class RenderThread:
+    """ Draws the frames on a separate thread, so a slow terminal (SSH, tmux) doesn't delay the game.
+
+    The game loop composes every frame into one of two preallocated buffers (acquire()) and hands it
+    over with present(). The writer thread always draws the latest presented frame, a frame that is
+    replaced before the writer got to it is dropped. curses is not thread safe, so every curses call
+    goes through self.lock: the writer holds it while drawing, and getch() only reads a key itself if
+    the lock is free, so the game loop never waits for the terminal. On a slow terminal the writer
+    holds the lock nearly all the time, so after every frame it also reads the pending keys into a
+    queue that getch() hands out first; no key waits longer than one frame.
+
+    Args:
+        renderer (Renderer): Draws the frames to the terminal.
+        threaded (bool): Start the writer thread. If False, present() draws right away on the calling thread.
+        on_frame (callable, optional): Called with every presented frame on the calling thread, e.g. to stream it to spectators.
+    """
+
+    def __init__(self, renderer, threaded=True, on_frame=None):
+        self.renderer = renderer
+        self.on_frame = on_frame
+        self.lock = threading.Lock() # Lock for all curses calls
+        self.presented = 0 # Frames drawn to the terminal
+        self.dropped = 0 # Frames replaced by a newer one before they were drawn
+        self._buffers = () # The two frame buffers
+        self._back = None # Index of the buffer the game loop composes into
+        self._pending = None # Index of the buffer waiting for the writer
+        self._drawing = None # Index of the buffer the writer is drawing
+        self._condition = threading.Condition()
+        self._error = None # Exception raised by the writer thread, raised again by present()
+        self._keys = queue.SimpleQueue() # Keys the writer read after drawing, in the order they were pressed
+        self._running = threaded
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._write, name='render', daemon=True)
+            self._thread.start()
+
+    def acquire(self, shape):
+        """ Returns the buffer to compose the next frame into. Its old content is undefined.
+        Args:
+            shape (tuple): (height, width) of the frame. The buffers are only reallocated when it changes.
+        Returns:
+            np.ndarray: A uint8 array of the shape.
+        """
+        with self._condition:
+            if not self._buffers or self._buffers[0].shape != shape:
+                while self._drawing is not None:
+                    self._condition.wait()
+                self._buffers = (np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8))
+                self._pending = None
+            # Never the buffer the writer is drawing. If the other one is still waiting for the writer,
+            # the writer has fallen behind and that frame is dropped.
+            free = [index for index in (0, 1) if index != self._drawing]
+            back = next((index for index in free if index != self._pending), free[0])
+            if back == self._pending:
+                self._pending = None
+                self.dropped += 1
+            self._back = back
+            return self._buffers[back]
+
+    def present(self):
+        """ Hands the buffer from acquire() to the writer. """
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            back, self._back = self._back, None
+            if self.on_frame is not None:
+                self.on_frame(self._buffers[back])
+            if self._thread is not None:
+                self._pending = back
+                self._condition.notify_all()
+                return
+        with self.lock:
+            self.renderer.draw(self._buffers[back])
+        self.presented += 1
+
+    def draw(self, screen):
+        """ Presents a prebuilt screen (start, pause or crash screen). """
+        np.copyto(self.acquire(screen.shape), screen)
+        self.present()
+
+    def adopt(self, screen):
+        """ Tells the renderer that a screen is already on the terminal (see Renderer.adopt()). """
+        with self.lock:
+            self.renderer.adopt(screen)
+
+    def getch(self):
+        """ Reads a key without waiting for the writer.
+        Returns:
+            int: The key, or -1 if there is none. While the writer is drawing, only the keys it read after
+                the previous frame are returned, the others stay in the input buffer of the terminal until
+                the writer or the next call reads them.
+        """
+        try:
+            return self._keys.get_nowait()
+        except queue.Empty:
+            pass
+        if not self.lock.acquire(blocking=False):
+            return -1
+        try:
+            # The writer may have read keys between the check above and taking the lock, they come first.
+            if not self._keys.empty():
+                return self._keys.get_nowait()
+            return self.renderer.stdscr.getch()
+        finally:
+            self.lock.release()
+
+    def resize(self):
+        """ Lets the renderer read the new size of the terminal. """
+        with self.lock:
+            self.renderer.resize()
+
+    def flush(self):
+        """ Waits until the writer has drawn the last presented frame. """
+        with self._condition:
+            while (self._pending is not None or self._drawing is not None) and self._running:
+                self._condition.wait()
+
+    def close(self):
+        """ Draws the last presented frame and stops the writer thread. """
+        if self._thread is None:
+            return
+        self.flush()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def _write(self):
+        """ Writer thread: draws the latest presented frame until close() is called. """
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                self._drawing, self._pending = self._pending, None
+                frame = self._buffers[self._drawing]
+            try:
+                with self.lock:
+                    self.renderer.draw(frame)
+                    # getch() can't read keys while the lock is held, read them for it.
+                    key = self.renderer.stdscr.getch()
+                    while key != -1:
+                        self._keys.put(key)
+                        key = self.renderer.stdscr.getch()
+            except Exception as error:
+                with self._condition:
+                    self._error = error
+                    self._running = False
+                    self._drawing = None
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._drawing = None
+                self.presented += 1
+                self._condition.notify_all()
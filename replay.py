@@ -0,0 +1,170 @@
+from engine import GameState, step, FLAP, NOOP, EVENT_CRASH
+
+# Replay file layout: MAGIC, then unsigned varints (7 bits per byte, lowest bits first):
+#   version, seed, difficulty, height, width, frames, score, crash frame + 1 (0 if the game did not crash),
+#   number of SPACE presses, then the frame index of every press as the difference to the previous press.
+MAGIC = b'PGRP'
+VERSION = 2 # 2: the penguin only collides with its visible cells, version 1 replays follow other rules
+
+
+def encode_varint(value, out):
+    """ Appends an unsigned integer as a varint to a bytearray. """
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    """ Reads a varint from data at pos.
+    Returns:
+        tuple: (value, position after the varint).
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    """ Seed, settings and inputs of one game, enough to re-simulate it frame by frame.
+    Frames are counted in engine steps, time spent in the pause screen is not part of a replay.
+
+    Raises:
+        ValueError: If the seed is negative (the file format stores it unsigned).
+    """
+
+    def __init__(self, seed, difficulty, height=30, width=150, presses=None, frames=0, score=0, crash_frame=-1):
+        if seed < 0:
+            raise ValueError(f"a replay can't store the negative seed {seed}")
+        self.seed = seed
+        self.difficulty = difficulty
+        self.height = height
+        self.width = width
+        self.presses = presses if presses is not None else [] # frame indices of the SPACE presses, ascending
+        self.frames = frames # number of frames played
+        self.score = score # final score
+        self.crash_frame = crash_frame # frame in which the penguin crashed, -1 if the game was quit
+
+    def record(self, frame, action):
+        """ Adds the action of a frame. Frames have to be recorded in order.
+        Args:
+            frame (int): The frame index (GameState.timesteps before the step).
+            action (int): FLAP or NOOP.
+        """
+        if action == FLAP:
+            self.presses.append(frame)
+        self.frames = frame + 1
+
+    def finish(self, state):
+        """ Stores the result of the game. """
+        self.frames = state.timesteps
+        self.score = state.score
+        self.crash_frame = state.timesteps - 1 if state.crashed else -1
+
+    def to_bytes(self):
+        """ Encodes the replay in the compact binary format. """
+        out = bytearray(MAGIC)
+        for value in (VERSION, self.seed, self.difficulty, self.height, self.width,
+                      self.frames, self.score, self.crash_frame + 1, len(self.presses)):
+            encode_varint(value, out)
+        previous = 0
+        for frame in self.presses:
+            encode_varint(frame - previous, out)
+            previous = frame
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ Decodes a replay created by to_bytes().
+        Raises:
+            ValueError: If the data is not a replay of a known version.
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a Pengu Fly replay")
+        pos = len(MAGIC)
+        values = []
+        for _ in range(9):
+            value, pos = decode_varint(data, pos)
+            values.append(value)
+        version, seed, difficulty, height, width, frames, score, crash_frame, count = values
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+
+        presses = []
+        frame = 0
+        for _ in range(count):
+            delta, pos = decode_varint(data, pos)
+            frame += delta
+            presses.append(frame)
+        return cls(seed, difficulty, height, width, presses, frames, score, crash_frame - 1)
+
+    def save(self, path):
+        """ Writes the replay to a file. """
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a replay from a file. """
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayPlayer:
+    """ Hands out the recorded actions of a replay, one frame after the other. """
+
+    def __init__(self, replay):
+        self.replay = replay
+        self._next = 0 # index of the next press in replay.presses
+
+    def action(self, frame):
+        """ Returns the recorded action of a frame. Frames have to be requested in order. """
+        presses = self.replay.presses
+        while self._next < len(presses) and presses[self._next] < frame:
+            self._next += 1
+        if self._next < len(presses) and presses[self._next] == frame:
+            self._next += 1
+            return FLAP
+        return NOOP
+
+    def finished(self, frame):
+        """ Returns True once all recorded frames have been played. """
+        return frame >= self.replay.frames
+
+    def reset(self):
+        """ Starts handing out the actions from the first frame again. """
+        self._next = 0
+
+    def new_game(self):
+        """ Creates the game of the replay and rewinds the player to its first frame. """
+        self.reset()
+        replay = self.replay
+        return GameState(replay.difficulty, replay.height, replay.width, replay.seed)
+
+
+def simulate(replay, state=None):
+    """ Re-simulates a replay headless.
+    Args:
+        replay (Replay): The replay to play.
+        state (GameState, optional): A game with the same size and difficulty to reuse, a new one if None.
+    Returns:
+        GameState: The game after the last recorded frame or the crash.
+    """
+    if state is None:
+        state = GameState(replay.difficulty, replay.height, replay.width, replay.seed)
+    else:
+        state.set_difficulty(replay.difficulty)
+        state.reset(replay.seed)
+
+    presses = set(replay.presses)
+    for frame in range(replay.frames):
+        state, events = step(state, FLAP if frame in presses else NOOP)
+        if events & EVENT_CRASH:
+            break
+    return state
@@ -0,0 +1,348 @@
+import os
+import socket
+import struct
+import curses
+import argparse
+import selectors
+import threading
+import numpy as np
+from renderer import Renderer, changed_runs
+from menus import KEY_ESC
+
+# Stream format: a sequence of messages, each one a HEADER followed by its payload.
+#   KEYFRAME payload: height*width bytes, the whole frame row by row.
+#   DELTA payload: number of runs (uint32), then (row, start, end) of every run as uint16, then the new
+#     bytes of all runs one after the other. A delta turns the frame the client has into frame number.
+# All numbers are little endian.
+HEADER = struct.Struct('<BIHHI') # message type, frame number, height, width, payload length
+KEYFRAME = ord('K')
+DELTA = ord('D')
+COUNT = struct.Struct('<I')
+
+HISTORY = 16 # Frames kept by the server to send deltas from, clients further behind get a keyframe
+SEND_SIZE = 1 << 16 # Bytes handed to send() at once
+
+
+def parse_address(address):
+    """ Turns a command line address into a socket family and address.
+    Args:
+        address (str): A path of a Unix socket (anything with a '/'), 'host:port' or only a port (localhost).
+    Returns:
+        tuple: (family, address) for socket.socket() and bind() / connect().
+    """
+    if '/' in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def encode_keyframe(number, frame):
+    """ Returns the message with a whole frame. """
+    height, width = frame.shape
+    return HEADER.pack(KEYFRAME, number, height, width, height * width) + frame.tobytes()
+
+
+def encode_delta(number, previous, frame, scratch=None):
+    """ Returns the message that turns previous into frame: only the runs of cells that changed.
+    Args:
+        number (int): Number of the new frame.
+        previous (np.ndarray): The frame the client has.
+        frame (np.ndarray): The new frame, with the same shape.
+        scratch (np.ndarray, optional): Reused buffer for changed_runs().
+    """
+    height, width = frame.shape
+    rows, starts, ends = changed_runs(previous, frame, scratch)
+    runs = np.empty((len(rows), 3), dtype='<u2')
+    runs[:, 0], runs[:, 1], runs[:, 2] = rows, starts, ends
+    # The runs cover exactly the changed cells in row order, so their bytes are the cells selected by the change mask.
+    cells = frame[previous != frame].tobytes()
+    payload = COUNT.pack(len(rows)) + runs.tobytes() + cells
+    return HEADER.pack(DELTA, number, height, width, len(payload)) + payload
+
+
+def apply_message(frame, kind, height, width, payload):
+    """ Applies a message to a frame.
+    Args:
+        frame (np.ndarray): The frame before the message, or None. Changed in place.
+        kind, height, width: From the header of the message.
+        payload (bytes-like): The payload of the message.
+    Returns:
+        np.ndarray: The frame after the message, a new array if a keyframe changed the size.
+    Raises:
+        ValueError: If the message is not a keyframe or a delta.
+    """
+    if kind == KEYFRAME:
+        cells = np.frombuffer(payload, dtype=np.uint8, count=height * width).reshape(height, width)
+        if frame is None or frame.shape != cells.shape:
+            return cells.copy()
+        np.copyto(frame, cells)
+    elif kind == DELTA:
+        count, = COUNT.unpack_from(payload)
+        runs = np.frombuffer(payload, dtype='<u2', count=3 * count, offset=COUNT.size).reshape(count, 3)
+        cells = np.frombuffer(payload, dtype=np.uint8, offset=COUNT.size + runs.nbytes)
+        lengths = runs[:, 2].astype(np.intp) - runs[:, 1]
+        starts = runs[:, 0].astype(np.intp) * width + runs[:, 1] # Flat index of the first cell of every run
+        # The k-th cell of the payload belongs to the run it falls into: its flat index is the start of the run
+        # plus k minus the position of the run in the payload.
+        np.put(frame, np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(len(cells)), cells)
+    else:
+        raise ValueError(f"unknown frame message {kind}")
+    return frame
+
+
+class _Viewer:
+    """ A connected spectator: its socket and what it has been sent. """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.number = None # Number of the last frame queued for the viewer (None -> needs a keyframe)
+        self.out = memoryview(b'') # Rest of the message that is being sent
+        self.waiting = False # Registered for EVENT_WRITE because the socket didn't take the whole message
+
+
+class SpectatorServer:
+    """ Broadcasts the frames of the running game to any number of viewers on a local socket.
+
+    The game calls publish() with every frame it draws. That only copies the frame, all network work
+    happens on the server thread: a new viewer gets a keyframe, afterwards it gets the runs of cells
+    that changed since the frame it has. A viewer is only sent the next message once the previous one
+    is out, so a slow viewer skips straight to the latest frame instead of queueing up old ones. The
+    delta from one frame to the latest is encoded once and shared by every viewer at that frame.
+
+    Args:
+        address (str): Where to listen, see parse_address(). TCP only listens on localhost unless a host is given.
+    """
+
+    def __init__(self, address):
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address) # Left over from a previous run
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self.address)
+        self._listener.listen(128)
+        self._listener.setblocking(False)
+        self._wake_reader, self._wake_writer = socket.socketpair() # publish() and close() wake the thread up through it
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+
+        self._lock = threading.Lock() # Guards _latest and _published
+        self._latest = None # Copy of the last published frame
+        self._published = 0 # Number of the last published frame (0 -> none yet)
+        self._running = True
+
+        # Only used by the server thread
+        self._history = {} # frame number -> frame, the last HISTORY frames the thread picked up
+        self._number = 0 # Number of the newest frame in _history
+        self._keyframe = None # Encoded keyframe of the newest frame
+        self._deltas = {} # from frame number -> encoded delta to the newest frame
+        self._scratch = None # Reused buffer for changed_runs()
+        self._viewers = {} # socket -> _Viewer
+        self._selector = selectors.DefaultSelector()
+        self._thread = threading.Thread(target=self._serve, name='spectator', daemon=True)
+        self._thread.start()
+
+    @property
+    def viewers(self):
+        """ Number of connected viewers. """
+        return len(self._viewers)
+
+    def publish(self, frame):
+        """ Hands a frame to the server. Cheap enough to call for every frame of the game. """
+        with self._lock:
+            if self._latest is None or self._latest.shape != frame.shape:
+                self._latest = np.empty_like(frame)
+            np.copyto(self._latest, frame)
+            self._published += 1
+        try:
+            self._wake_writer.send(b'\0')
+        except BlockingIOError:
+            pass # The thread has not picked up the previous wake-ups yet, it will see this frame too.
+
+    def close(self):
+        """ Disconnects all viewers and stops the server thread. """
+        self._running = False
+        try:
+            self._wake_writer.send(b'\0')
+        except BlockingIOError:
+            pass
+        self._thread.join()
+        for sock in self._viewers:
+            sock.close()
+        self._selector.close()
+        if self._listener.family == socket.AF_UNIX:
+            os.unlink(self.address)
+        self._listener.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+    def _serve(self):
+        """ Server thread: accepts viewers and sends them the newest frame whenever they are ready for it. """
+        selector = self._selector
+        selector.register(self._listener, selectors.EVENT_READ)
+        selector.register(self._wake_reader, selectors.EVENT_READ)
+        while self._running:
+            for key, events in selector.select():
+                sock = key.fileobj
+                if sock is self._listener:
+                    self._accept()
+                elif sock is self._wake_reader:
+                    try:
+                        while sock.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif sock not in self._viewers:
+                    continue # Dropped while handling an earlier event
+                elif events & selectors.EVENT_READ:
+                    self._drop(sock) # Viewers don't send anything, readable means closed.
+                else:
+                    self._send(self._viewers[sock])
+            self._pick_up()
+
+    def _accept(self):
+        """ Accepts all waiting viewers. """
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            viewer = _Viewer(sock)
+            self._viewers[sock] = viewer
+            self._selector.register(sock, selectors.EVENT_READ)
+            self._send(viewer)
+
+    def _drop(self, sock):
+        """ Disconnects a viewer. """
+        self._selector.unregister(sock)
+        del self._viewers[sock]
+        sock.close()
+
+    def _pick_up(self):
+        """ Takes the newest published frame into the history and sends it to every viewer that is idle. """
+        with self._lock:
+            if self._published == self._number:
+                return
+            number = self._published
+            # Forget the frames that are too old (frames the thread skipped are missing) and reuse a buffer of them.
+            frame = None
+            for old in [old for old in self._history if old <= number - HISTORY]:
+                frame = self._history.pop(old)
+            if frame is None or frame.shape != self._latest.shape:
+                frame = np.empty_like(self._latest)
+            np.copyto(frame, self._latest)
+        if self._history and next(iter(self._history.values())).shape != frame.shape:
+            self._history.clear() # The game changed its size, deltas from older frames don't fit.
+        self._history[number] = frame
+        self._number = number
+        self._keyframe = None
+        self._deltas.clear()
+        for viewer in list(self._viewers.values()):
+            if not viewer.out:
+                self._send(viewer)
+
+    def _message(self, since):
+        """ Returns the message that brings a viewer from frame since (None: nothing) to the newest frame. """
+        if since is None or since not in self._history:
+            if self._keyframe is None:
+                self._keyframe = encode_keyframe(self._number, self._history[self._number])
+            return self._keyframe
+        message = self._deltas.get(since)
+        if message is None:
+            frame = self._history[self._number]
+            if self._scratch is None or self._scratch.shape != (frame.shape[0], frame.shape[1] + 2):
+                self._scratch = np.zeros((frame.shape[0], frame.shape[1] + 2), dtype=bool)
+            message = self._deltas[since] = encode_delta(self._number, self._history[since], frame, self._scratch)
+        return message
+
+    def _send(self, viewer):
+        """ Sends as much as the socket takes, then queues the newest frame if the viewer is behind. """
+        while True:
+            if not viewer.out:
+                if not self._number or viewer.number == self._number:
+                    break
+                viewer.out = memoryview(self._message(viewer.number))
+                viewer.number = self._number
+            try:
+                sent = viewer.sock.send(viewer.out[:SEND_SIZE])
+            except BlockingIOError:
+                break
+            except OSError:
+                self._drop(viewer.sock)
+                return
+            viewer.out = viewer.out[sent:]
+        # Only watch for writability while a message is stuck.
+        if viewer.waiting != bool(viewer.out):
+            viewer.waiting = bool(viewer.out)
+            self._selector.modify(viewer.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if viewer.waiting else 0))
+
+
+class SpectatorClient:
+    """ Connects to a SpectatorServer and rebuilds the frames from its messages.
+    Args:
+        address (str): Address of the server, see parse_address().
+    """
+
+    def __init__(self, address):
+        family, address = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(address)
+        self.frame = None # The current frame
+        self.number = 0 # Its number in the stream of the server
+
+    def close(self):
+        self.sock.close()
+
+    def _read(self, size):
+        """ Reads exactly size bytes.
+        Raises:
+            ConnectionError: If the server closed the connection.
+        """
+        data = bytearray(size)
+        view = memoryview(data)
+        while view:
+            count = self.sock.recv_into(view)
+            if count == 0:
+                raise ConnectionError("spectator server closed the connection")
+            view = view[count:]
+        return data
+
+    def receive(self):
+        """ Waits for the next message and applies it.
+        Returns:
+            np.ndarray: The new frame (the same array is updated by the following calls unless the size changes).
+        """
+        kind, number, height, width, length = HEADER.unpack(self._read(HEADER.size))
+        self.frame = apply_message(self.frame, kind, height, width, self._read(length))
+        self.number = number
+        return self.frame
+
+
+def watch(stdscr, address):
+    """ Shows the game streamed by a SpectatorServer until it stops or ESC is pressed. """
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    renderer = Renderer(stdscr)
+    client = SpectatorClient(address)
+    try:
+        while True:
+            frame = client.receive()
+            key = stdscr.getch()
+            if key == KEY_ESC:
+                return
+            elif key == curses.KEY_RESIZE:
+                renderer.resize()
+            renderer.draw(frame)
+    except ConnectionError:
+        return
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a game of Pengu Fly started with --spectate")
+    parser.add_argument('address', help="path of the Unix socket, or [host:]port")
+    args = parser.parse_args()
+    curses.wrapper(watch, args.address)
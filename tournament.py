@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from engine import GameState, step, DIFFICULTIES, WALLWIDTH, FLAP, NOOP, EVENT_CRASH
+from autopilot import Autopilot
+from replay import Replay, ReplayPlayer
+from helper_functions import git_commit
+
+# Settings that are swept, in the order of the grid points (difficulty first)
+PARAMETERS = ('opening_height', 'wall_distance', 'offset', 'fps')
+
+# One game per screen size and worker process, reused for every game
+_games = {}
+# Replays of a directory per difficulty, loaded once per worker process
+_replays = {}
+
+
+class RandomTapper:
+    """ Presses SPACE at random, on average rate times per second (whatever the tick rate is). """
+
+    def __init__(self, rate, seed):
+        self.rate = rate
+        self.rng = random.Random(f"tapper-{seed}") # Not the sequence of the walls of the same seed
+
+    def action(self, state):
+        return FLAP if self.rng.random() < self.rate / state.fps else NOOP
+
+
+class ReplayPolicy:
+    """ Presses SPACE in the frames in which a player pressed it in a recorded game. The presses are
+    played open loop: with the settings the replay was recorded with the game is the recorded one,
+    with other settings the walls move differently but the rhythm of the player stays the same.
+    """
+
+    def __init__(self, replay):
+        self.player = ReplayPlayer(replay)
+
+    def action(self, state):
+        return self.player.action(state.timesteps)
+
+
+def load_replays(directory):
+    """ Loads the replays of a directory. Files that can't be read are skipped, like verify.py reports
+    them as errors instead of stopping.
+    Returns:
+        tuple: (replays, errors), replays maps a difficulty to the replays recorded with it, ordered by
+            file name, errors lists (path, message) of the skipped files.
+    """
+    if directory not in _replays:
+        replays = {}
+        errors = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.replay'):
+                path = os.path.join(directory, name)
+                try:
+                    replay = Replay.load(path)
+                except (OSError, ValueError, IndexError) as error:
+                    errors.append((path, str(error)))
+                    continue
+                except Exception as error: # Anything else a broken file triggers only skips that file.
+                    errors.append((path, f"{type(error).__name__}: {error}"))
+                    continue
+                replays.setdefault(replay.difficulty, []).append(replay)
+        _replays[directory] = replays, errors
+    return _replays[directory]
+
+
+def parse_policy(spec):
+    """ Checks a policy given on the command line: 'random' or 'random:RATE' (presses per second),
+    'autopilot' or 'replays:DIR' (the SPACE presses of the recorded games in DIR).
+    Returns:
+        str: The policy in canonical form.
+    Raises:
+        argparse.ArgumentTypeError: If the policy is unknown.
+    """
+    name, _, argument = spec.partition(':')
+    if name == 'random':
+        try:
+            rate = float(argument or 2.5)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid rate in {spec!r}")
+        return f"random:{rate:g}"
+    if name == 'autopilot' and not argument:
+        return name
+    if name == 'replays' and argument:
+        if not os.path.isdir(argument):
+            raise argparse.ArgumentTypeError(f"no directory {argument!r}")
+        return spec
+    raise argparse.ArgumentTypeError(f"unknown policy {spec!r} (random[:RATE], autopilot or replays:DIR)")
+
+
+def make_policy(policy, difficulty, game, seed):
+    """ Creates the player of one game.
+    Args:
+        policy (str): The policy (see parse_policy()).
+        difficulty (int): Difficulty of the grid point, replays are taken from the ones recorded with it.
+        game (int): Number of the game at the grid point.
+        seed (int): Seed of the walls.
+    Returns:
+        tuple: (player with an action(state) method, seed of the walls, number of frames or None).
+    """
+    name, _, argument = policy.partition(':')
+    if name == 'random':
+        return RandomTapper(float(argument), seed), seed, None
+    if name == 'autopilot':
+        return Autopilot(), seed, None
+    replays = load_replays(argument)[0][difficulty]
+    replay = replays[game % len(replays)]
+    return ReplayPolicy(replay), replay.seed, replay.frames
+
+
+def play_games(task):
+    """ Plays a chunk of games of one grid point with one policy headless (runs in a worker process).
+    Args:
+        task (tuple): (point, policy, first game, number of games, seed of the first game, seconds per game,
+            height, width), point is (difficulty, *PARAMETERS).
+    Returns:
+        tuple: (point, policy, results) with (score, frames, crashed) of every game.
+    """
+    point, policy, first, count, seed, seconds, height, width = task
+    difficulty, settings = point[0], dict(zip(PARAMETERS, point[1:]))
+    size = (height, width)
+    if size not in _games:
+        _games[size] = GameState(difficulty, height, width, seed)
+    state = _games[size]
+    state.set_difficulty(difficulty, **settings)
+
+    results = []
+    for game in range(first, first + count):
+        player, game_seed, frames = make_policy(policy, difficulty, game, seed + game)
+        state.reset(game_seed)
+        limit = seconds * state.fps if frames is None else min(frames, seconds * state.fps)
+        crashed = False
+        while state.timesteps < limit:
+            state, events = step(state, player.action(state))
+            if events & EVENT_CRASH:
+                crashed = True
+                break
+        results.append((state.score, state.timesteps, crashed))
+    return point, policy, results
+
+
+def parameter_grid(difficulties, deltas):
+    """ Builds the grid points around the presets of the difficulties.
+    Args:
+        difficulties (list): The difficulties to sweep.
+        deltas (dict): Name of the parameter -> changes to the preset value to try.
+    Returns:
+        tuple: (points, skipped), the points as (difficulty, *PARAMETERS) and the number of combinations
+            that can't be played (no opening, walls overlapping each other, negative offset or tick rate).
+    """
+    points = []
+    skipped = 0
+    for difficulty in difficulties:
+        preset = DIFFICULTIES[difficulty]
+        for values in itertools.product(*([preset[name] + delta for delta in deltas[name]] for name in PARAMETERS)):
+            settings = dict(zip(PARAMETERS, values))
+            if (settings['opening_height'] < 1 or settings['wall_distance'] <= WALLWIDTH
+                    or settings['offset'] < 0 or settings['fps'] < 1):
+                skipped += 1
+            else:
+                points.append((difficulty, *values))
+    return points, skipped
+
+
+def survival_curve(results, fps, seconds):
+    """ Kaplan-Meier estimate of the fraction of games still running after every whole second. Games that
+    did not crash (time limit, end of a replay) only count while they were played.
+    Returns:
+        list: seconds + 1 fractions, the first one (0 s) is 1.
+    """
+    crashes = [0] * (seconds + 1) # crashes[t]: games that crashed in second t (1 <= t)
+    ended = [0] * (seconds + 1) # ended[t]: games that ended without a crash in second t
+    for _, frames, crashed in results:
+        second = min(seconds, max(1, math.ceil(frames / fps)))
+        (crashes if crashed else ended)[second] += 1
+    curve = [1.0]
+    at_risk = len(results)
+    for second in range(1, seconds + 1):
+        if at_risk:
+            curve.append(curve[-1] * (1 - crashes[second] / at_risk))
+        else:
+            curve.append(curve[-1])
+        at_risk -= crashes[second] + ended[second]
+    return curve
+
+
+def summarize(point, policy, results, seconds):
+    """ Aggregates the games of one grid point and policy into the statistics of the results file. """
+    scores = sorted(score for score, _, _ in results)
+    histogram = [0] * (scores[-1] + 1)
+    for score in scores:
+        histogram[score] += 1
+    deciles = statistics.quantiles(scores, n=10, method='inclusive') if len(scores) > 1 else [scores[0]] * 9
+    entry = {'difficulty': point[0]}
+    entry.update(zip(PARAMETERS, point[1:]))
+    entry.update({
+        'policy': policy,
+        'games': len(results),
+        'crashes': sum(1 for _, _, crashed in results if crashed),
+        'frames': sum(frames for _, frames, _ in results),
+        'score_mean': statistics.fmean(scores),
+        'score_stdev': statistics.stdev(scores) if len(scores) > 1 else 0.0,
+        'score_p10': deciles[0],
+        'score_p50': deciles[4],
+        'score_p90': deciles[8],
+        'score_max': scores[-1],
+        'score_histogram': histogram, # score_histogram[n]: games that ended with n points
+        'survival_walls': [sum(histogram[n:]) / len(scores) for n in range(len(histogram))], # games that passed n walls
+        'survival_seconds': survival_curve(results, point[4], seconds), # games still running after t seconds
+    })
+    return entry
+
+
+def parse_deltas(text):
+    """ Parses a comma separated list of integers such as '-2,0,2'. """
+    try:
+        return sorted({int(value) for value in text.split(',')})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected integers separated by commas, not {text!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many headless games of Pengu Fly over a grid of settings around "
+                                                 "the difficulty presets and collect score and survival statistics.")
+    parser.add_argument('-d', '--difficulty', type=int, action='append', choices=sorted(DIFFICULTIES),
+                        help="difficulty preset to sweep around (repeatable, default: all)")
+    parser.add_argument('-p', '--policy', type=parse_policy, action='append',
+                        help="player: random[:RATE] (RATE presses per second at random, default 2.5), autopilot or "
+                             "replays:DIR (the presses of the recorded games in DIR); repeatable, default: random and autopilot")
+    parser.add_argument('--opening-height', type=parse_deltas, default=[-2, 0, 2], metavar='DELTAS',
+                        help="changes to the preset opening height (default: -2,0,2)")
+    parser.add_argument('--wall-distance', type=parse_deltas, default=[-8, 0, 8], metavar='DELTAS',
+                        help="changes to the preset wall distance (default: -8,0,8)")
+    parser.add_argument('--offset', type=parse_deltas, default=[-2, 0, 2], metavar='DELTAS',
+                        help="changes to the preset offset between consecutive openings (default: -2,0,2)")
+    parser.add_argument('--fps', type=parse_deltas, default=[-10, 0, 10], metavar='DELTAS',
+                        help="changes to the preset tick rate (default: -10,0,10)")
+    parser.add_argument('-n', '--games', type=int, default=200, help="games per grid point and policy (default: 200)")
+    parser.add_argument('-s', '--seconds', type=int, default=120, help="longest game in seconds of play (default: 120)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, game i uses seed+i at every grid point")
+    parser.add_argument('--size', type=int, nargs=2, default=(30, 150), metavar=('HEIGHT', 'WIDTH'),
+                        help="screen size of the games (default: 30 150)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of worker processes (default: all cores)")
+    parser.add_argument('-o', '--output', default='tournament.json', help="result file (default: tournament.json)")
+    args = parser.parse_args(argv)
+    if args.games < 1 or args.seconds < 1:
+        parser.error("--games and --seconds have to be positive")
+
+    difficulties = sorted(set(args.difficulty or DIFFICULTIES))
+    policies = list(dict.fromkeys(args.policy or ['random:2.5', 'autopilot']))
+    deltas = {name: getattr(args, name) for name in PARAMETERS}
+    points, skipped = parameter_grid(difficulties, deltas)
+    height, width = args.size
+
+    for policy in policies:
+        if policy.startswith('replays:'):
+            for path, error in load_replays(policy.partition(':')[2])[1]:
+                print(f"ERROR    {path}: {error} (skipped)")
+
+    # Split the games of every grid point and policy into chunks, enough of them to keep all workers busy
+    # until the end. Replays are only played at the grid points of the difficulty they were recorded with.
+    tasks = []
+    chunk = max(1, min(50, math.ceil(len(points) * len(policies) * args.games / (8 * args.jobs))))
+    for point in points:
+        for policy in policies:
+            if policy.startswith('replays:') and point[0] not in load_replays(policy.partition(':')[2])[0]:
+                continue
+            for first in range(0, args.games, chunk):
+                tasks.append((point, policy, first, min(chunk, args.games - first), args.seed, args.seconds, height, width))
+    if not tasks:
+        parser.error("nothing to play (no valid grid point, or no replays of the chosen difficulties)")
+
+    start_time = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for point, policy, games in executor.map(play_games, tasks):
+            results.setdefault((point, policy), []).extend(games)
+    elapsed_time = time.perf_counter() - start_time
+
+    entries = [summarize(point, policy, games, args.seconds) for (point, policy), games in results.items()]
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'height': height,
+        'width': width,
+        'seed': args.seed,
+        'seconds': args.seconds,
+        'deltas': deltas,
+        'jobs': args.jobs,
+        'elapsed_s': elapsed_time,
+        'results': entries,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    # Share of the games still flying after 10 and 30 seconds, or at the end of shorter games.
+    horizons = sorted({min(10, args.seconds), min(30, args.seconds)})
+    print(f"{'d':>2} {'open':>4} {'dist':>4} {'off':>3} {'fps':>3}  {'policy':24s} {'mean':>6} {'p50':>5} {'p90':>5}  "
+          + " ".join(f"{f'alive {seconds}s':>9}" for seconds in horizons))
+    for entry in entries:
+        survival = entry['survival_seconds']
+        print(f"{entry['difficulty']:2d} {entry['opening_height']:4d} {entry['wall_distance']:4d} {entry['offset']:3d} "
+              f"{entry['fps']:3d}  {entry['policy'][:24]:24s} {entry['score_mean']:6.1f} {entry['score_p50']:5.1f} "
+              f"{entry['score_p90']:5.1f}  " + " ".join(f"{survival[seconds]:9.2f}" for seconds in horizons))
+
+    games = sum(entry['games'] for entry in entries)
+    duration = sum(entry['frames'] / entry['fps'] for entry in entries)
+    speed = duration / elapsed_time if elapsed_time > 0 else 0
+    print(f"{games} games at {len(points)} grid points ({skipped} skipped) in {elapsed_time:.2f} s with {args.jobs} processes "
+          f"({games / elapsed_time:.0f} games/s, {speed:.0f}x real time)")
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from engine import GameState, DIFFICULTIES, MIN_HEIGHT, MIN_WIDTH
+from replay import Replay, simulate
+
+# Limits for submitted replays: the game never plays on a smaller screen, and larger screens or longer
+# games than these would only be sent to make the verifier run out of memory or time.
+MAX_HEIGHT, MAX_WIDTH = 500, 1000
+MAX_SECONDS = 6 * 3600 # Longest game, in seconds of play
+
+# One game per screen size and worker process, reused for every replay
+_games = {}
+
+
+def verify_replay(replay):
+    """ Re-simulates a replay headless with the engine of the game and compares the result with its claim.
+    Args:
+        replay (Replay): The replay to check.
+    Returns:
+        tuple: (valid, score, crash_frame) with the simulated final score and crash frame (-1 if the game did not crash).
+    Raises:
+        ValueError: If the replay can't come from the game (unknown difficulty, screen size or length out of bounds).
+    """
+    if replay.difficulty not in DIFFICULTIES:
+        raise ValueError(f"unknown difficulty {replay.difficulty}")
+    if not (MIN_HEIGHT <= replay.height <= MAX_HEIGHT and MIN_WIDTH <= replay.width <= MAX_WIDTH):
+        raise ValueError(f"screen size {replay.width}x{replay.height} outside of {MIN_WIDTH}x{MIN_HEIGHT} to {MAX_WIDTH}x{MAX_HEIGHT}")
+    if replay.frames > MAX_SECONDS * DIFFICULTIES[replay.difficulty]['fps']:
+        raise ValueError(f"{replay.frames} frames is longer than {MAX_SECONDS} s of play")
+    if replay.presses and replay.presses[-1] >= replay.frames:
+        raise ValueError("SPACE pressed after the last frame")
+
+    size = (replay.height, replay.width)
+    if size not in _games:
+        _games[size] = GameState(replay.difficulty, replay.height, replay.width, replay.seed)
+    state = simulate(replay, _games[size])
+
+    crash_frame = state.timesteps - 1 if state.crashed else -1
+    valid = state.score == replay.score and crash_frame == replay.crash_frame and state.timesteps == replay.frames
+    return valid, state.score, crash_frame
+
+
+def verify_file(path):
+    """ Verifies one replay file (runs in a worker process).
+    Returns:
+        tuple: (path, valid, claimed score, simulated score, claimed crash frame, simulated crash frame,
+            frames, duration of the game in seconds, error)
+    """
+    try:
+        replay = Replay.load(path)
+        valid, score, crash_frame = verify_replay(replay)
+        duration = replay.frames / DIFFICULTIES[replay.difficulty]['fps']
+        return path, valid, replay.score, score, replay.crash_frame, crash_frame, replay.frames, duration, None
+    except (OSError, ValueError, IndexError) as error:
+        return path, False, None, None, None, None, 0, 0, str(error)
+    except Exception as error: # Anything else a crafted file triggers is an error of that file, not of the whole run.
+        return path, False, None, None, None, None, 0, 0, f"{type(error).__name__}: {error}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the scores of Pengu Fly replays by re-simulating them.")
+    parser.add_argument('directory', help="directory with .replay files")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of worker processes (default: all cores)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="also list the valid replays")
+    args = parser.parse_args(argv)
+
+    paths = sorted(os.path.join(args.directory, name) for name in os.listdir(args.directory) if name.endswith('.replay'))
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(executor.map(verify_file, paths, chunksize=max(1, len(paths) // (4 * args.jobs))))
+    elapsed_time = time.perf_counter() - start_time
+
+    valid = invalid = errors = frames = duration = 0
+    for path, ok, claimed_score, score, claimed_crash, crash_frame, replay_frames, replay_duration, error in results:
+        frames += replay_frames
+        duration += replay_duration
+        if error is not None:
+            errors += 1
+            print(f"ERROR    {path}: {error}")
+        elif ok:
+            valid += 1
+            if args.verbose:
+                print(f"VALID    {path}: score {score}, crash frame {crash_frame}")
+        else:
+            invalid += 1
+            print(f"INVALID  {path}: claimed score {claimed_score} (simulated {score}), "
+                  f"claimed crash frame {claimed_crash} (simulated {crash_frame})")
+
+    # Speed compared to watching all replays in real time
+    speed = duration / elapsed_time if elapsed_time > 0 else 0
+    print(f"{len(results)} replays: {valid} valid, {invalid} invalid, {errors} unreadable")
+    print(f"{frames} frames ({duration:.0f} s of play) in {elapsed_time:.2f} s with {args.jobs} processes ({speed:.0f}x real time)")
+    return 0 if invalid == 0 and errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
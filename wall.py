@@ -2,11 +2,33 @@ import random
 import math
 
 class Wall:
-    def __init__(self, height, width, opening_height, offset, last_center):
+    def __init__(self, height, width, opening_height, offset, last_center, rng=random, x=0):
         self.height = height
         self.width = width
         self.opening_height = opening_height
         # Adjust opening_position relative to wall height
         upper_bound = min(last_center + offset, height - math.ceil(opening_height/2)-1)
         lower_bound = max(last_center - offset, math.ceil(opening_height/2)+1)
-        self.opening_position = random.randint(lower_bound, upper_bound)
\ No newline at end of file
+        # rng is the random number generator of the game (random.Random), the global one by default
+        self.opening_position = rng.randint(lower_bound, upper_bound)
+
+        # Geometry on the screen. The wall covers the columns [x, x+width), only its first and last column
+        # are solid ('|'). The screen rows [opening_top, opening_bottom) of those columns are free, the
+        # other rows of the play field (1 to height) are blocked.
+        self.x = x
+        half = math.ceil(opening_height/2)
+        self.opening_top = self.opening_position - half + 1
+        self.opening_bottom = self.opening_position + half + 1
+
+    def edges(self):
+        """ Returns the screen columns of the two solid edges of the wall. """
+        return self.x, self.x + self.width - 1
+
+    def blocks(self, row):
+        """ Checks if the edges of the wall are solid in a screen row.
+        Args:
+            row (int): The screen row (0 and height+1 are the border).
+        Returns:
+            bool: True if the row is inside the play field and outside the opening.
+        """
+        return 1 <= row <= self.height and not self.opening_top <= row < self.opening_bottom